@@ -1,5 +1,5 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_bcrypt import bcrypt
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, create_refresh_token, get_jwt_identity
 from mysql.connector.errors import DatabaseError
@@ -12,8 +12,14 @@ import pytz
 import os
 import requests
 
-import osmnx as ox
-import networkx as nx
+from distance_matrix import get_distance_matrix, get_sparse_entries
+from graph_tiles import TileManager
+from isochrone import CELL_SIZE, RIDING_SPEED, get_arrival_times, get_cell_centers, get_cell_polygons, get_grid_cells, get_isochrone_csgraph
+from leg_pool import LegPool
+from lru_cache import LRUCache
+from polyline import POLYLINE_PRECISION, encode_polyline, get_zoom_tolerance, simplify
+from route_catalog import RouteCatalog
+from transit import RANKINGS, WALKING_TRANSFER_RADIUS, TransitIndex, iter_complete_routes, pack_nodes, unpack_nodes
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -39,8 +45,81 @@ cursor = db.cursor()
 ph_timezone = pytz.timezone('Asia/Manila')
 
 # Load the graph containing the network of roads and streets in the Philippines
-print("Loading graph...")
-graph = ox.load_graphml("batangas_city.graphml")
+# The GraphML file is converted once into a compact snapshot that is memory-mapped on startup
+GRAPH_FILE = "batangas_city.graphml"
+
+# Directory of the street graph tiles written by graph_tiles.py, used instead of the single graph if it exists
+# Tiles are loaded on demand and the least recently used ones are dropped once they go over the memory limit
+GRAPH_TILES = os.getenv("GRAPH_TILES", "tiles")
+GRAPH_MEMORY_LIMIT = int(os.getenv("GRAPH_MEMORY_LIMIT", 512 * 2**20))
+
+# Shortest paths between pairs of nodes are cached for each loaded graph, bounded by the total number of nodes
+# stored across all the paths
+PATH_CACHE_SIZE = int(os.getenv("PATH_CACHE_SIZE", 1_000_000))
+
+# Routes with at least this many legs to compute are split across a pool of worker processes
+LEG_PROCESSES = int(os.getenv("LEG_PROCESSES", os.cpu_count() or 1))
+PARALLEL_LEG_THRESHOLD = int(os.getenv("PARALLEL_LEG_THRESHOLD", 8))
+
+# Maximum number of pin sequences in a single batch routing request
+MAX_BATCH_ROUTES = int(os.getenv("MAX_BATCH_ROUTES", 500))
+
+# Maximum number of origins and of destinations in a single distance matrix request
+MAX_MATRIX_POINTS = int(os.getenv("MAX_MATRIX_POINTS", 500))
+
+# Number of route combinations found for directions by default and at most
+ROUTE_RESULTS = int(os.getenv("ROUTE_RESULTS", 5))
+MAX_ROUTE_RESULTS = int(os.getenv("MAX_ROUTE_RESULTS", 20))
+
+# Time in seconds that finding route combinations for directions may take at most, after which the best
+# combinations found so far are returned
+ROUTE_SEARCH_TIME_BUDGET = float(os.getenv("ROUTE_SEARCH_TIME_BUDGET", 2.0))
+
+# Farthest that riders walk in meters to transfer between routes that pass near each other, which the stored
+# connections are found with, so backfill_connections.py has to be run again after changing it
+WALKING_RADIUS = float(os.getenv("WALKING_TRANSFER_RADIUS", WALKING_TRANSFER_RADIUS))
+
+# Farthest that riders walk in meters from their location to where they start riding and from where they stop
+# riding to their destination, and the number of nearest places to start and stop riding that are searched from,
+# each one on routes that the nearer ones are not on
+WALKING_ACCESS_DISTANCE = float(os.getenv("WALKING_ACCESS_DISTANCE", 1000))
+WALKING_ACCESS_NODES = int(os.getenv("WALKING_ACCESS_NODES", 8))
+
+# Longest travel time in minutes of an isochrone, which bounds the area of the street graph it covers
+MAX_ISOCHRONE_MINUTES = int(os.getenv("MAX_ISOCHRONE_MINUTES", 90))
+
+# Smallest size in meters of the cells of an isochrone, which bounds the number of cells it has
+MIN_ISOCHRONE_CELL_SIZE = int(os.getenv("MIN_ISOCHRONE_CELL_SIZE", 50))
+
+# Records of the directions are cached for each loaded graph, bounded by their total size in bytes as JSON text
+DIRECTIONS_CACHE_SIZE = int(os.getenv("DIRECTIONS_CACHE_SIZE", 64 * 2**20))
+
+# Graphs of the isochrone search are cached for each loaded graph, bounded by their total size in bytes
+ISOCHRONE_GRAPH_CACHE_SIZE = int(os.getenv("ISOCHRONE_GRAPH_CACHE_SIZE", 256 * 2**20))
+
+
+# Load the street graphs along with everything derived from them
+# Cached paths belong to the loaded graphs, so they are dropped whenever the graphs are reloaded, and so do the
+# routes of the catalog, whose coordinates come from the graphs, and the cached directions and isochrone graphs
+def load_graph():
+    global street_tiles, leg_pool, route_catalog, directions_cache, isochrone_graph_cache
+
+    print("Loading graph...")
+    if TileManager.has_tiles(GRAPH_TILES):
+        street_tiles = TileManager.load(GRAPH_TILES, GRAPH_MEMORY_LIMIT, PATH_CACHE_SIZE)
+    else:
+        street_tiles = TileManager.from_graphml(GRAPH_FILE, GRAPH_MEMORY_LIMIT, PATH_CACHE_SIZE)
+
+    # Worker processes hold the previous graphs, so they are replaced along with them
+    if "leg_pool" in globals():
+        leg_pool.shutdown()
+    leg_pool = LegPool(street_tiles, LEG_PROCESSES, PARALLEL_LEG_THRESHOLD)
+    route_catalog = RouteCatalog(street_tiles, walking_radius=WALKING_RADIUS)
+    directions_cache = LRUCache(DIRECTIONS_CACHE_SIZE, get_size=lambda records: len(json.dumps(records)))
+    isochrone_graph_cache = LRUCache(ISOCHRONE_GRAPH_CACHE_SIZE, get_size=lambda csgraph: csgraph.data.nbytes + csgraph.indices.nbytes + csgraph.indptr.nbytes)
+
+
+load_graph()
 
 
 # Execute queries by force to handle cases where the database connection timed out
@@ -54,6 +133,64 @@ def execute_query(query, params = tuple(), force=True, count=0):
         cursor.execute(query, params)
 
 
+# Execute a query by force and get all of its rows
+def fetch_all(query, params = tuple()):
+    execute_query(query, params)
+    return cursor.fetchall()
+
+
+# Store where a newly added route meets the existing routes, both in the new route and in every route it meets,
+# so that route finding reads them instead of comparing the nodes of the routes for every request
+# Only the candidate routes near the new route are read, which are the routes of the route catalog whose bounding
+# box is within the walking radius of the new route, since no other route can meet it or pass near it
+# Routes that were not migrated to nodes yet are left out, since their connections are found for every request, and
+# so are routes on streets that are not in the street graph, which the route catalog leaves out as well
+# The data version is bumped in the same transaction and given to every changed route, so that the route catalogs
+# of every worker load them on their next request
+# Returns False without changing anything if the new route cannot be read back, otherwise True, and the caller
+# commits the transaction
+def update_connections(route_id, coords: list):
+    route_ids = [route_id] + [other_id for other_id in route_catalog.get_nearby_route_ids(coords, WALKING_RADIUS) if other_id != route_id]
+    query = f"SELECT id, nodes, connections FROM routes WHERE nodes IS NOT NULL AND id IN ({', '.join(['%s'] * len(route_ids))})"
+    routes = []
+    connections = []
+    for res in fetch_all(query, tuple(route_ids)):
+        nodes = unpack_nodes(res[1])
+        try:
+            route_coords = street_tiles.get_node_coords(nodes)
+        except KeyError:
+            continue
+
+        routes.append({"id": res[0], "nodes": nodes, "coords": route_coords})
+        connections.append(json.loads(res[2]) if res[2] else None)
+
+    # Only the new route has to be compared with the others
+    route = next((index for index, route in enumerate(routes) if route["id"] == route_id), None)
+    if route is None:
+        return False
+
+    transit_index = TransitIndex(routes, walking_radius=WALKING_RADIUS)
+    route_connections = transit_index.find_connections(route)
+
+    execute_query("UPDATE data_version SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+    execute_query("SELECT LAST_INSERT_ID()")
+    version = cursor.fetchone()[0]
+
+    query = "UPDATE routes SET connections=%s, version=%s WHERE id=%s"
+    execute_query(query, (json.dumps(route_connections), version, route_id))
+
+    for index, other in enumerate(routes):
+        # Routes without stored connections yet keep having them found from their nodes until backfilled
+        pairs = route_connections.get(str(other["id"]))
+        if pairs is None or connections[index] is None:
+            continue
+
+        connections[index][str(route_id)] = sorted([pair[1], pair[0]] + pair[2:] for pair in pairs)
+        execute_query(query, (json.dumps(connections[index]), version, other["id"]))
+
+    return True
+
+
 # Helper function for checking bad requests
 def has_missing_data(required_data: list):
     for data in required_data:
@@ -169,27 +306,6 @@ def login():
         ), 401
         
 
-# Compute the distance between two geological points
-def get_distance(point_1, point_2):
-     # Define the radius of the Earth in kilometers
-    radius = 6371
-
-    # Convert latitude and longitude from decimal degrees to radians
-    lat1, lon1 = math.radians(point_1[0]), math.radians(point_1[1])
-    lat2, lon2 = math.radians(point_2[0]), math.radians(point_2[1])
-
-    # Compute the differences between the latitudes and longitudes
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-
-    # Compute the Haversine distance
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    distance = radius * c
-
-    return distance
-
-
 # Computes the center coordinate from a list of coordinates
 def get_center(points: list):
     lat_sum = 0.0
@@ -205,7 +321,162 @@ def get_center(points: list):
     return (center_lon, center_lat)
 
 
+# Read the format of the geometry returned by the routing endpoints from a request body
+# Geometry is sent as nested [lat, lon] lists by default, or as an encoded polyline if the format is "polyline",
+# and is simplified for drawing at a zoom level if simplify is given
+# Returns None if the format is not valid
+def get_geometry_format(data: dict):
+    geometry_format = {
+        "format": data.get("format", "coords"),
+        "precision": data.get("precision", POLYLINE_PRECISION),
+        "simplify": data.get("simplify", None),
+    }
+
+    if geometry_format["format"] not in ("coords", "polyline"):
+        return None
+
+    precision = geometry_format["precision"]
+    if isinstance(precision, bool) or not isinstance(precision, int) or not 1 <= precision <= 10:
+        return None
+
+    zoom = geometry_format["simplify"]
+    if zoom is not None and (isinstance(zoom, bool) or not isinstance(zoom, (int, float)) or not 0 <= zoom <= 22):
+        return None
+
+    return geometry_format
+
+
+# Read the departure time of a request body in seconds since midnight in the Philippines
+# The departure time is either a time of the day like "17:30" or a date and time like "2024-05-01T17:30:00+08:00",
+# where dates and times without a timezone are in the Philippines and the others are converted to it, and it is
+# the current time if not given
+# Returns None if the departure time is not valid
+def get_departure_seconds(data: dict):
+    departure_time = data.get("departure_time", None)
+    if departure_time is None:
+        departure = datetime.datetime.now(ph_timezone)
+    elif not isinstance(departure_time, str):
+        return None
+    else:
+        try:
+            departure = datetime.time.fromisoformat(departure_time)
+
+            # Times of the day with a timezone are taken on the current date to be converted like dates and times
+            if departure.tzinfo is not None:
+                departure = datetime.datetime.combine(datetime.datetime.now(ph_timezone).date(), departure).astimezone(ph_timezone)
+        except ValueError:
+            try:
+                departure = datetime.datetime.fromisoformat(departure_time)
+            except ValueError:
+                return None
+
+            if departure.tzinfo is not None:
+                departure = departure.astimezone(ph_timezone)
+
+    return departure.hour * 3600 + departure.minute * 60 + departure.second
+
+
+# Read the options of the route combinations of a request body, which are the number of combinations to find,
+# the criterion to rank them by, and the time in seconds that finding them may take, which is capped by the server
+# Returns None if any of the options is not valid
+def get_route_search_options(data: dict):
+    k = data.get("k", ROUTE_RESULTS)
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= MAX_ROUTE_RESULTS:
+        return None
+
+    criterion = data.get("criterion", "transfers")
+    if criterion not in RANKINGS:
+        return None
+
+    time_budget = data.get("time_budget", ROUTE_SEARCH_TIME_BUDGET)
+    if isinstance(time_budget, bool) or not isinstance(time_budget, (int, float)) or time_budget <= 0:
+        return None
+
+    return k, criterion, min(time_budget, ROUTE_SEARCH_TIME_BUDGET)
+
+
+# Convert a list of [lat, lon] points into the geometry format requested by the client
+def format_geometry(points: list, geometry_format: dict):
+    if geometry_format["simplify"] is not None and len(points) > 0:
+        tolerance = get_zoom_tolerance(geometry_format["simplify"], points[0][0])
+        points = simplify(points, tolerance)
+
+    if geometry_format["format"] == "polyline":
+        return encode_polyline(points, geometry_format["precision"])
+
+    return points
+
+
+# Get the shortest path of each leg between consecutive nodes
+# Each path starts with the last node of the previous one, or is just that node if both ends are the same
+# Long routes have their legs computed in parallel by the worker processes
+def get_leg_paths(network, nodes: list):
+    return leg_pool.get_leg_paths(network, nodes)
+
+
+# Get the geological coordinates of the pins snapped to the street graph
+# Pins are snapped to their nearest node, or projected on their nearest edge if snap is "edge"
+def get_snapped_coords(network, pins: list, snap="node"):
+    if snap == "edge":
+        return [projection.point for projection in network.snap_to_edges(pins)]
+
+    return network.get_coords(network.snap(pins))
+
+
+# Get where the pins are snapped to the street graph, as the OpenStreetMap ids of their nearest nodes, or as the
+# ids of the nodes of their nearest edges along with the fraction of the edges where they are projected
+def get_snapped_key(network, pins: list, snap="node"):
+    if snap == "edge":
+        node_ids = network.graph.node_ids
+        return tuple(
+            (int(node_ids[projection.first]), int(node_ids[projection.second]), round(projection.fraction, 6))
+            for projection in network.snap_to_edges(pins)
+        )
+
+    return tuple(network.get_node_ids(pins))
+
+
+# Get the geological coordinates of the shortest path of each leg between consecutive pins
+# With edge snapping, each leg starts and ends at the points where the pins were projected on their nearest
+# edge instead of at the nearest intersection, which avoids detours on long blocks
+def get_leg_coords(network, pins: list, snap="node"):
+    if snap == "edge":
+        projections = network.snap_to_edges(pins)
+        return [network.shortest_projected_path(source, target) for source, target in zip(projections, projections[1:])]
+
+    nearest_nodes = network.snap(pins)
+    return [network.get_coords(path) for path in get_leg_paths(network, nearest_nodes)]
+
+
+# Compare the new pins of a route with its previous pins to find the legs that changed
+# Returns where the changed legs start, where they stop in the new list of legs, and where the legs they
+# replace stop in the previous list of legs
+def get_changed_legs(pins: list, previous_pins: list):
+    max_common = min(len(pins), len(previous_pins))
+
+    # Count the pins that stayed the same at the start and at the end of the route
+    prefix = 0
+    while prefix < max_common and pins[prefix] == previous_pins[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while suffix < max_common - prefix and pins[-1 - suffix] == previous_pins[-1 - suffix]:
+        suffix += 1
+
+    # A leg only stays the same if both of its pins did
+    start = max(prefix - 1, 0)
+    kept_legs = max(suffix - 1, 0)
+    stop = max(len(pins) - 1 - kept_legs, start)
+    previous_stop = max(len(previous_pins) - 1 - kept_legs, start)
+
+    return start, stop, previous_stop
+
+
 # Endpoint for finding the shortest path that sequentially passes through all a list of geological points
+# If the previous pins of the route are also given, only the legs between pins that changed are computed,
+# and the client replaces its previous legs from splice["start"] up to splice["stop"] with them
+# The format, precision and simplify fields of the request choose the format of the geometry, see get_geometry_format
+# Pins are snapped to their nearest intersection, or to the nearest point of their nearest street if snap is "edge"
 @app.route("/route", methods=["POST"])
 @jwt_required()
 def get_route():
@@ -213,35 +484,51 @@ def get_route():
 
     # Get the geological coordinates of all the pins
     pins = data.get("pins", None)
+    previous_pins = data.get("previous_pins", None)
+    snap = data.get("snap", "node")
 
-    # Store the path by getting the list of intersection or nodes it passes through
-    route_nodes = []
+    geometry_format = get_geometry_format(data)
+    if geometry_format is None:
+        return jsonify(msg="Bad Request: Invalid geometry format"), 400
+
+    if snap not in ("node", "edge"):
+        return jsonify(msg="Bad Request: Invalid snapping mode"), 400
     
     try:
-        # Iterate each geological point from the list and get the shortest path to each other
-        for coord in pins:
-            # Find the nearest node or intersection from each geological point
-            nearest_node = ox.distance.nearest_nodes(graph, coord[1], coord[0])
-
-            # Check if the nearest node is the same as the previous node, if yes, disregard, otherwise append to the list of nodes
-            if len(route_nodes) > 0:
-                if route_nodes[-1] == nearest_node:
-                    continue
-            else:
-                route_nodes.append(nearest_node)
-                continue
+        if previous_pins is not None:
+            start, stop, previous_stop = get_changed_legs(pins, previous_pins)
 
-            # Get the shortest path from the previous node to the current node
-            path = nx.shortest_path(graph, route_nodes[-1], nearest_node, weight="length")
+            # Only load and snap the pins of the legs that changed
+            legs = []
+            if stop > start:
+                changed_pins = pins[start:stop + 1]
+                network = street_tiles.get_network(changed_pins)
+                legs = get_leg_coords(network, changed_pins, snap)
 
-            # Add the path to the list of route nodes
-            route_nodes += path[1:]
-
-        # Convert the nodes into geological coordinates
-        route = [[graph.nodes[node]['y'], graph.nodes[node]['x']] for node in route_nodes]
+            return jsonify(
+                legs=[format_geometry(leg, geometry_format) for leg in legs],
+                splice={
+                    "start": start,
+                    "stop": previous_stop,
+                },
+            ), 200
+
+        # Get the street graph that covers the pins
+        network = street_tiles.get_network(pins)
+
+        # Snap all the geological points at once and find the path of each leg between them
+        legs = get_leg_coords(network, pins, snap)
+
+        # Join the legs into a single route, where each leg starts where the previous one ends
+        if len(legs) == 0:
+            route = get_snapped_coords(network, pins, snap)
+        else:
+            route = legs[0]
+            for leg in legs[1:]:
+                route += leg[1:]
 
         return jsonify(
-            route=route,
+            route=format_geometry(route, geometry_format),
         ), 200
     
     # Catch exceptions which stem from lack of map data and invalid pin placements
@@ -251,6 +538,153 @@ def get_route():
         ), 404
     
 
+# Check if pins are a non-empty list of [lat, lon] points
+def is_valid_pins(pins):
+    if not isinstance(pins, list) or len(pins) == 0:
+        return False
+
+    for pin in pins:
+        if not isinstance(pin, list) or len(pin) != 2:
+            return False
+        if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in pin):
+            return False
+
+    return True
+
+
+# Endpoint for finding the routes of many pin sequences at once, such as for bulk tools
+# Takes a list of pin sequences in "routes" and returns the route of each one in the same order, where each
+# result is either {"route": ...} or {"msg": ...} if that route could not be found
+# Pins are snapped once for all the routes on the same street network, and legs shared by several routes
+# are only computed once
+@app.route("/route/batch", methods=["POST"])
+@jwt_required()
+def get_batch_routes():
+    data = request.json
+
+    routes = data.get("routes", None)
+    if not isinstance(routes, list):
+        return jsonify(msg="Bad Request: Incomplete data"), 400
+
+    if len(routes) > MAX_BATCH_ROUTES:
+        return jsonify(msg=f"Bad Request: A batch can have at most {MAX_BATCH_ROUTES} routes"), 400
+
+    geometry_format = get_geometry_format(data)
+    if geometry_format is None:
+        return jsonify(msg="Bad Request: Invalid geometry format"), 400
+
+    no_path_message = "There is no path that connect the pins, try being more precise with the pins."
+    results = [None] * len(routes)
+
+    # Group the routes by the street network that covers their pins
+    groups = {}
+    for index, pins in enumerate(routes):
+        if not is_valid_pins(pins):
+            results[index] = {"msg": "Bad Request: Invalid pins"}
+            continue
+
+        try:
+            network = street_tiles.get_network(pins)
+        except Exception:
+            results[index] = {"msg": no_path_message}
+            continue
+
+        groups.setdefault(network.tile_names, (network, []))[1].append(index)
+
+    for network, indexes in groups.values():
+        try:
+            # Snap every distinct pin of the group in a single query
+            unique_pins = list(dict.fromkeys(tuple(pin) for index in indexes for pin in routes[index]))
+            pin_nodes = dict(zip(unique_pins, network.snap(unique_pins)))
+            route_nodes = {index: [pin_nodes[tuple(pin)] for pin in routes[index]] for index in indexes}
+
+            # Find the path of every distinct leg of the group only once
+            legs = list(dict.fromkeys(leg for nodes in route_nodes.values() for leg in zip(nodes, nodes[1:])))
+            leg_paths = dict(zip(legs, leg_pool.get_paths(network, legs, skip_errors=True)))
+
+        except Exception:
+            for index in indexes:
+                results[index] = {"msg": no_path_message}
+            continue
+
+        for index in indexes:
+            nodes = route_nodes[index]
+            paths = [leg_paths[leg] for leg in zip(nodes, nodes[1:])]
+            if None in paths:
+                results[index] = {"msg": no_path_message}
+                continue
+
+            path_nodes = nodes[:1]
+            for path in paths:
+                path_nodes += path[1:]
+
+            results[index] = {"route": format_geometry(network.get_coords(path_nodes), geometry_format)}
+
+    return jsonify(
+        routes=results,
+    ), 200
+
+
+# Endpoint for the walking distances in meters from many origins to many destinations at once
+# Destinations default to the origins, and max_distance skips the destinations farther than it from each origin
+# Returns every distance as a dense matrix with null for unreachable destinations, or only the reachable
+# distances as lists of rows, columns and distances if the format is "sparse"
+@app.route("/matrix", methods=["POST"])
+@jwt_required()
+def get_matrix():
+    data = request.json
+
+    origins = data.get("origins", None)
+    destinations = data.get("destinations", origins)
+    matrix_format = data.get("format", "dense")
+    max_distance = data.get("max_distance", None)
+
+    # Filter out bad requests
+    if not is_valid_pins(origins) or not is_valid_pins(destinations):
+        return jsonify(msg="Bad Request: Invalid origins or destinations"), 400
+
+    if len(origins) > MAX_MATRIX_POINTS or len(destinations) > MAX_MATRIX_POINTS:
+        return jsonify(msg=f"Bad Request: A matrix can have at most {MAX_MATRIX_POINTS} origins and destinations"), 400
+
+    if matrix_format not in ("dense", "sparse"):
+        return jsonify(msg="Bad Request: Invalid matrix format"), 400
+
+    if max_distance is not None and (isinstance(max_distance, bool) or not isinstance(max_distance, (int, float)) or max_distance < 0):
+        return jsonify(msg="Bad Request: Invalid maximum distance"), 400
+
+    try:
+        # Snap the origins and destinations at once, then run a single search from each distinct origin
+        network = street_tiles.get_network(origins + destinations)
+        nodes = network.snap(origins + destinations)
+        distances = get_distance_matrix(
+            network.get_csgraph(),
+            nodes[:len(origins)],
+            nodes[len(origins):],
+            max_distance,
+            directed=False,
+        )
+
+    except Exception:
+        return jsonify(
+            msg="There is no map data that covers the given points.",
+        ), 404
+
+    if matrix_format == "sparse":
+        rows, columns, values = get_sparse_entries(distances)
+        return jsonify(
+            shape=[len(origins), len(destinations)],
+            rows=rows,
+            columns=columns,
+            distances=[round(value, 1) for value in values],
+        ), 200
+
+    # JSON has no infinity, so unreachable destinations are null
+    matrix = [[round(value, 1) if value != float("inf") else None for value in row] for row in distances.tolist()]
+    return jsonify(
+        distances=matrix,
+    ), 200
+
+
 # Helper function for obtaining the id of value from a column in the database
 def fetch_id_or_insert(table, column, value):
     # Query the database for the given value in a specific columns from specific taable
@@ -302,11 +736,23 @@ def add_route():
     if has_missing_data(route_info):
         return jsonify(msg="Bad Request: Incomplete data"), 400
 
+    if not is_valid_pins(coords):
+        return jsonify(msg="Bad Request: Invalid route coordinates"), 400
+
+    # Routes are stored as the ids of the street graph nodes they pass through instead of their coordinates
+    try:
+        nodes = street_tiles.find_route_nodes(coords)
+    except KeyError:
+        return jsonify(msg="Bad Request: The route is outside of the street graph"), 400
+
+    # Load the routes contributed since the last request, which are the candidates for the connections of the new
+    # route, before the new route is inserted since loading them ends the open transaction
+    route_catalog.refresh(fetch_all, db.rollback)
+
     # Insert route information into routes table
-    query = "INSERT INTO routes (name, description, start_time, end_time, coords, uploader_id) VALUES (%s, %s, %s, %s, %s, %s)"
-    params = (name, description, start_time, end_time, json.dumps(coords), uploader_id)
+    query = "INSERT INTO routes (name, description, start_time, end_time, nodes, uploader_id) VALUES (%s, %s, %s, %s, %s, %s)"
+    params = (name, description, start_time, end_time, pack_nodes(nodes), uploader_id)
     execute_query(query, params)
-    db.commit()
 
     # Get the resulting route id
     query = "SELECT LAST_INSERT_ID()"
@@ -317,14 +763,141 @@ def add_route():
     query = "INSERT INTO route_areas (region_id, state_id, city_id, route_id) VALUES (%s, %s, %s, %s)"
     params = (region_id, state_id, city_id, route_id)
     execute_query(query, params)
-    db.commit() 
+
+    # The route is only stored along with its connections, so nothing is stored if they cannot be
+    if not update_connections(route_id, street_tiles.get_node_coords(nodes)):
+        db.rollback()
+        return jsonify(msg="The route could not be stored, please try again"), 500
+
+    db.commit()
 
     return jsonify(
         msg="Uploaded route successfully.",
     ), 200
 
 
+# Get the smallest possible vicinity of a route area to limit the number of candidate routes, as the column of
+# the route areas and its value, where the column is None if the route area has none of them
+def get_route_area_filter(route_area: dict):
+    region = route_area.get("region", None)
+    region_id = fetch_id_or_insert("regions", "name", region) if region is not None else None
+    
+    state = route_area.get("state", None)
+    state_id = fetch_id_or_insert("states", "name", state) if state is not None else None
+    
+    city_id = route_area.get("city_id", None)
+
+    route_area_ids = {
+        "city_id": city_id,
+        "state_id": state_id,
+        "region_id": region_id,
+    }
+
+    for column, value in route_area_ids.items():
+        if value is not None:
+            return column, value
+
+    return None, None
+
+
+# Find the k best route combinations from any of the nodes where the user can start riding to any of the nodes
+# where they can stop riding and get the records of the directions as the route combinations are found
+# Accesses are lists of (node_id, distance, coords) from the nearest, see StreetNetwork.find_walking_access, where
+# the coordinates of the end accesses go from the node to the destination
+# The first record has the walks to and from the nearest nodes, followed by a record for each route combination
+# with its steps, its own walks and its scores in the order of the ranking, and the last record sums them up, where
+# complete is false if the time budget cut the search short and better route combinations may have been missed
+def iter_directions_records(transit_index, start_access: list, end_access: list, search_options: tuple, geometry_format: dict):
+    k, criterion, time_budget = search_options
+
+    # Convert the geometry of the walks only once and send the nearest ones before searching
+    start_walks = {node_id: format_geometry(coords, geometry_format) for node_id, _, coords in start_access}
+    end_walks = {node_id: format_geometry(coords, geometry_format) for node_id, _, coords in end_access}
+    yield dict(type="walks", start_walk=start_walks[start_access[0][0]], end_walk=end_walks[end_access[0][0]])
+
+    # Get the k best route combinations from the list of candidate routes that connect the user's current
+    # location to their destination, ranked by the criterion, along with the scores they were ranked by
+    starts = {node_id: distance for node_id, distance, _ in start_access}
+    ends = {node_id: distance for node_id, distance, _ in end_access}
+    count = 0
+    routes = iter_complete_routes(transit_index, starts, ends, k, criterion, time_budget)
+    while True:
+        try:
+            route_steps, scores, (start, end) = next(routes)
+        except StopIteration as stop:
+            complete = stop.value
+            break
+
+        yield dict(
+            type="route",
+            route=[dict(route_step, coords=format_geometry(route_step["coords"], geometry_format)) for route_step in route_steps],
+            walks=dict(start_walk=start_walks[start], end_walk=end_walks[end]),
+            scores=scores,
+        )
+        count += 1
+
+    yield dict(type="summary", routes=count, complete=complete)
+
+
+# Get the records of directions without any route combinations, where the walks are empty
+def get_empty_directions_records(geometry_format: dict):
+    return [
+        dict(type="walks", start_walk=format_geometry([], geometry_format), end_walk=format_geometry([], geometry_format)),
+        dict(type="summary", routes=0, complete=True),
+    ]
+
+
+# Check whether the records of the directions are complete, see iter_directions_records
+# Directions found before the time budget ran out depend on how fast the search ran, so they are not cached
+def is_complete_directions(records: list):
+    return len(records) > 0 and records[-1]["type"] == "summary" and records[-1]["complete"]
+
+
+# Combine the records of the directions into a single response, see iter_directions_records
+# The walks of the directions are the walks of the first route combination, or the walks to and from the nearest
+# nodes if there are no route combinations
+def get_directions_response(records: list):
+    response = dict(start_walk=None, end_walk=None, routes=[], walks=[], scores=[])
+    for record in records:
+        if record["type"] == "walks":
+            response["start_walk"] = record["start_walk"]
+            response["end_walk"] = record["end_walk"]
+        elif record["type"] == "route":
+            if len(response["routes"]) == 0:
+                response.update(record["walks"])
+            response["routes"].append(record["route"])
+            response["walks"].append(record["walks"])
+            response["scores"].append(record["scores"])
+
+    return response
+
+
+# Stream the records of the directions as newline-delimited JSON, with one record on each line as soon as it is
+# found, and cache them once they are all sent if cache_key is given and the search was not cut short
+# The status of the response is already sent once the search runs, so an error ends the stream with an error record
+def stream_directions_records(records, cache_key=None):
+    sent = []
+    try:
+        for record in records:
+            sent.append(record)
+            yield json.dumps(record) + "\n"
+    except Exception:
+        yield json.dumps(dict(type="error", msg="There is no route that connects your current and target location")) + "\n"
+        return
+
+    if cache_key is not None and is_complete_directions(sent):
+        directions_cache.put(cache_key, sent)
+
+
 # Endpoint for obtaining the different route combinations that connects the user's location to the destination
+# The format, precision and simplify fields of the request choose the format of the geometry, see get_geometry_format
+# The origin and destination are snapped to their nearest intersection, or to their nearest street if snap is "edge"
+# Riders can start and stop riding at any of the nearest routes within walking distance, so each route combination
+# comes with its own walks
+# Only the routes running at the departure time are used, which is the current time unless departure_time is given
+# Responses are cached until a route is contributed, and the cache is bypassed if the cache field is false
+# If stream is true, the response is newline-delimited JSON sent as the route combinations are found, with the
+# walks first, then a line for each route combination and a summary last, see iter_directions_records
 @app.route("/directions", methods=["POST"])
 @jwt_required()
 def get_directions():
@@ -340,127 +913,94 @@ def get_directions():
     if has_missing_data(required_data):
         return jsonify(msg="Bad Request: Incomplete data"), 400
 
-    region = route_area.get("region", None)
-    region_id = fetch_id_or_insert("regions", "name", region) if region is not None else None
-    
-    state = route_area.get("state", None)
-    state_id = fetch_id_or_insert("states", "name", state) if state is not None else None
-    
-    city_id = route_area.get("city_id", None)
+    geometry_format = get_geometry_format(data)
+    if geometry_format is None:
+        return jsonify(msg="Bad Request: Invalid geometry format"), 400
 
-    route_area_ids = {
-        "city_id": city_id,
-        "state_id": state_id,
-        "region_id": region_id,
-    }
+    snap = data.get("snap", "node")
+    if snap not in ("node", "edge"):
+        return jsonify(msg="Bad Request: Invalid snapping mode"), 400
+
+    departure_seconds = get_departure_seconds(data)
+    if departure_seconds is None:
+        return jsonify(msg="Bad Request: Invalid departure time"), 400
+
+    search_options = get_route_search_options(data)
+    if search_options is None:
+        return jsonify(msg="Bad Request: Invalid route search options"), 400
+    k, criterion, time_budget = search_options
+
+    # Cached directions are bypassed if cache is false, which is useful for debugging the route finding
+    use_cache = data.get("cache", True)
+    if not isinstance(use_cache, bool):
+        return jsonify(msg="Bad Request: Invalid cache option"), 400
+
+    stream = data.get("stream", False)
+    if not isinstance(stream, bool):
+        return jsonify(msg="Bad Request: Invalid streaming option"), 400
 
     # Get the smallest possible vicinity that contains both the user's locations and destination
-    # to limit the number of routes to be queried from the database
-    condition = ""
-    for column, value in route_area_ids.items():
-        if value is not None:
-            condition = f" WHERE route_areas.{column}={value}"
-            break
+    # to limit the number of candidate routes
+    area_column, area_value = get_route_area_filter(route_area)
 
-    # Get the current time with the specified timezone
-    # Limit the query to currently available transport routes at a given time
-    current_time = datetime.datetime.now(ph_timezone).strftime('%H:%M:%S')
-    condition += f" AND routes.start_time <= '{current_time}' AND routes.end_time >= '{current_time}'"
-
-    # Columns to be obtained from the join query
-    columns = ", ".join([
-        "routes.id",
-        "routes.name",
-        "routes.description",
-        "routes.start_time",
-        "routes.end_time",
-        "routes.coords",
-        "routes.connections",
-        "routes.uploader_id",
-    ])
-
-    # Select all the routes that fall within the vicinity of the user's location and destination
-    # that is also available currently according to the transport vehicle schedules
-    query = f"SELECT {columns} FROM route_areas INNER JOIN routes ON route_areas.route_id = routes.id" + condition
-    execute_query(query)
-    results = cursor.fetchall()
-
-    # Store all the queried routes as "candidate routes," which are routes that have a good chance to be
-    # used by the user to get to their destination
-    candidate_routes = []
-
-    # Store all the entire network of transport routes from the candidate routes to be used
-    # for finding the nearest nodes where transport vehicles drive through
-    route_network_coords = []
-    for res in results:
-        # Get all the information for each route
-        route = {
-            "id": res[0],
-            "name": res[1],
-            "description": res[2],
-            "start_time": str(res[3]),
-            "end_time": str(res[4]),
-            "coords": json.loads(res[5]),
-            "connections": res[6],
-            "uploader_id": res[7],
-        }
-        candidate_routes.append(route)
-
-        # Iterate coordinates of each route and add unique coordinates to the network
-        for coord in route["coords"]:
-            if coord not in route_network_coords:
-                route_network_coords.append(coord)
+    # Load the routes that were contributed since the last request, then get the key of the candidate routes,
+    # which are the routes that fall within the vicinity of the user's location and destination and that are
+    # available at the departure time according to the transport vehicle schedules, including overnight routes
+    route_catalog.refresh(fetch_all, db.rollback)
+    index_key = route_catalog.get_index_key(area_column, area_value, departure_seconds)
 
     try:
-        # Convert the user's location and their destination to graph nodes
-        # to be used for finding the shortest path
-        origin_node = ox.distance.nearest_nodes(graph, origin[1], origin[0])
-        destination_node = ox.distance.nearest_nodes(graph, destination[1], destination[0])
-        
-        path = nx.shortest_path(graph, origin_node, destination_node, weight="length")
-        shortest_route = [[graph.nodes[node]['y'], graph.nodes[node]['x']] for node in path]
-
-        # Using the shortest path computed, get the route that the user must walk
-        # in order to reach the nearest main road or intersection where transport vehicles drive through
-        # from their current location as well as to reach their final locations
-        start_walk = None
-        for i, node in enumerate(shortest_route):
-            if node in route_network_coords:
-                start_walk = shortest_route[:i + 1]
-                break
-
-        end_walk = None
-        for i, node in reversed(list(enumerate(shortest_route))):
-            if node in route_network_coords:
-                end_walk = shortest_route[i:]
-                break
-
-        # If no walking routes were found, the user's location and the destinationn is not connected
-        # by any network of streets, therefore, return empty data to the client
-        if start_walk is None or end_walk is None:
-            return jsonify(
-                start_walk=[],
-                end_walk=[],
-                routes=[],
-            ), 200 
-        
-        # Get the location where the user will start walking and end walking
-        start = start_walk[-1]
-        end = end_walk[0]
+        # Directions are the same for every request whose locations snap to the same places of the street graph
+        # with the same candidate routes and options, so they are cached by them until a route is contributed
+        network = street_tiles.get_network([origin, destination])
+        cache_key = (
+            index_key,
+            get_snapped_key(network, [origin, destination], snap),
+            snap,
+            k,
+            criterion,
+            time_budget,
+            tuple(geometry_format.items()),
+        )
+        if use_cache:
+            records = directions_cache.get(cache_key)
+            if records is not None:
+                if stream:
+                    return Response(stream_directions_records(records), mimetype="application/x-ndjson"), 200
+                return jsonify(**get_directions_response(records)), 200
+
+        # Get the index of the candidate routes, which covers the nodes of the entire network of transport routes
+        # from the candidate routes to be used for finding the nearest nodes where transport vehicles drive
+        # through and the routes that pass through them
+        transit_index = route_catalog.get_transit_index(area_column, area_value, departure_seconds)
+
+        # Find the nearest nodes where transport vehicles drive through that the user can walk to from their
+        # current location and from which they can walk to their destination, with a single bounded search from
+        # each one that keeps the nearest node of each route within walking distance
+        get_routes = lambda node_id: transit_index.node_routes.get(node_id, ())
+        start_access = network.find_walking_access(origin, get_routes, WALKING_ACCESS_DISTANCE, WALKING_ACCESS_NODES, snap)
+        end_access = [
+            (node_id, distance, coords[::-1])
+            for node_id, distance, coords in network.find_walking_access(destination, get_routes, WALKING_ACCESS_DISTANCE, WALKING_ACCESS_NODES, snap)
+        ]
+
+        # If no transport routes are within walking distance of the user's location or of the destination,
+        # they are not connected by any network of streets, therefore, return empty data to the client
+        if len(start_access) == 0 or len(end_access) == 0:
+            records = get_empty_directions_records(geometry_format)
+        else:
+            records = iter_directions_records(transit_index, start_access, end_access, search_options, geometry_format)
 
-        # Get the shortest route combinations from the list of candidate routes that connect
-        # the user's current location to their destination
-        routes = get_complete_routes(candidate_routes, start, end)
+        # Streamed route combinations are sent while the search runs, so the directions are only cached once
+        # every record was sent, and neither streamed nor buffered directions are cached if the time budget ran out
+        if stream:
+            return Response(stream_directions_records(records, cache_key if use_cache else None), mimetype="application/x-ndjson"), 200
 
-        # If none was found, return an empty list
-        if routes is None:
-            routes = []
+        records = list(records)
+        if use_cache and is_complete_directions(records):
+            directions_cache.put(cache_key, records)
 
-        return jsonify(
-            start_walk=start_walk,
-            end_walk=end_walk,
-            routes=routes,
-        ), 200
+        return jsonify(**get_directions_response(records)), 200
     
     except:
         return jsonify(
@@ -468,122 +1008,128 @@ def get_directions():
         ), 404
 
 
-# Helper function for obtaining all the route combinations that connect the user's location to the destination 
-def get_complete_routes(candidate_routes, start, end):
-    complete_routes = []
+# Read the options of an isochrone request body, which are the travel time in minutes, the travel times of the
+# bands of polygons, the format of the areas, and the size of the cells in meters
+# Returns None if any of the options is not valid
+def get_isochrone_options(data: dict):
+    minutes = data.get("minutes", None)
+    if isinstance(minutes, bool) or not isinstance(minutes, (int, float)) or not 0 < minutes <= MAX_ISOCHRONE_MINUTES:
+        return None
 
-    # Get all the route combinations that pass through the starting node and ending node
-    start_routes = []
-    end_routes = []
+    bands = data.get("bands", [minutes])
+    if not isinstance(bands, list) or len(bands) == 0:
+        return None
+    if any(isinstance(band, bool) or not isinstance(band, (int, float)) or not 0 < band <= minutes for band in bands):
+        return None
 
-    for candidate_route in candidate_routes:
-        for i, coord in enumerate(candidate_route["coords"]):
-            if start == coord:
-                route = candidate_route.copy()
-                route["coords"] = route["coords"][i:]
-                start_routes.append(route)
+    area_format = data.get("format", "grid")
+    if area_format not in ("grid", "polygons"):
+        return None
 
-            if end == coord:
-                route = candidate_route.copy()
-                route["coords"] = route["coords"][:i + 1]
-                end_routes.append(route)
-    
-    # Handle cases where one transport vehicle is already enough to get to destination
-    for start_route in start_routes:
-        # Iterate each coordinates of routes that pass through the starting node
-        # then check if one of them also happens to be the ending node
-        for i, coord in enumerate(start_route["coords"]):
-            if end == coord:
-                route = start_route.copy()
-                route["coords"] = route["coords"][:i + 1]
-                complete_routes.append([route])
-                break
-
-    # Check if a complete route was found from the previous step
-    if len(complete_routes) > 0:
-        return complete_routes
-
-    # Handle cases where more than one transport vehicles is needed to get to destination
-
-    # Create network of route combinations that stem from the starting and ending node
-    # Additionally, store all the candidate routes as one whole network
-    start_network = [[route] for route in start_routes]
-    end_network = [[route] for route in end_routes]
-    full_network = [[route] for route in candidate_routes]
-
-    # Limit the size of the networks to only 5 to avoid overloading the server ram and cpu
-    for i in range(5):
-        # Find complete route combinations from the current extension of networks from both ends
-        complete_routes = get_connected_routes(start_network, end_network)
-
-        # If at least one was found, return the result immediately
-        if len(complete_routes) > 0:
-            return complete_routes
-        
-        # Expand or extend each network of routes from both ends alternately for each iteration
-        if i % 2 == 0:
-            start_network = get_connected_routes(start_network, full_network)
-        else:
-            end_network = get_connected_routes(full_network, end_network)
+    cell_size = data.get("cell_size", CELL_SIZE)
+    if isinstance(cell_size, bool) or not isinstance(cell_size, (int, float)) or cell_size < MIN_ISOCHRONE_CELL_SIZE:
+        return None
 
-        # If one of the route networks stops finding more routes to expand to from the network
-        # of candidate routes, stop the algorithm and return empty results
-        if len(start_network) == 0 or len(end_network) == 0:
-            return complete_routes
-            
-    
-# Helper function for obtaining all the connected routes from two sets of unique routes
-def get_connected_routes(network_a: list, network_b: list):
-    results = []
+    return minutes, sorted(bands), area_format, cell_size
 
-    # Pair each route combination from both network of routes
-    for leg_a in network_a:
-        for leg_b in network_b:
-            connected = False
 
-            # Get the connecting ends of both networks
-            end_a = leg_a[-1]
-            end_b = leg_b[0]
+# Get two points at the corners of the area that can be reached from a point within a travel time in seconds
+def get_reachable_bounds(point: list, seconds: float):
+    distance = seconds * RIDING_SPEED
+    lat_offset = distance / 111_320
+    lon_offset = distance / (111_320 * max(math.cos(math.radians(point[0])), 0.01))
+    return [[point[0] - lat_offset, point[1] - lon_offset], [point[0] + lat_offset, point[1] + lon_offset]]
 
-            # Do not check same routes
-            if end_a["id"] == end_b["id"]:
-                continue
 
-            # Get the coordinates of the connecting ends
-            end_a_coords = end_a["coords"]
-            end_b_coords = end_b["coords"]
-
-            # Find the earliest possible intersection between the two routes by finding
-            # intersecting coordinates from both routes sequentially
-            for i, coord_a in enumerate(end_a_coords):
-                for j, coord_b in enumerate(end_b_coords):
-                    if coord_a == coord_b:
-                        # Copy the routes to avoid modification of original routes
-                        sliced_end_a = end_a.copy()
-                        sliced_end_b = end_b.copy()
-
-                        # Slice the route based on where they intersected
-                        sliced_end_a["coords"] = end_a_coords[:i + 1]
-                        sliced_end_b["coords"] = end_b_coords[j:]
-
-                        # Copy the current leg of network to add the route to extend to
-                        new_leg_a = leg_a.copy()
-                        new_leg_b = leg_b.copy()
-
-                        new_leg_a[-1] = sliced_end_a
-                        new_leg_b[0] = sliced_end_b
-
-                        # Add the new legs as connected routes
-                        connected_route = new_leg_a + new_leg_b
-                        results.append(connected_route)
-                        
-                        connected = True
-                        break
-                
-                if connected:
-                    break
-
-    return results
+# Endpoint for finding everywhere that can be reached from the origin within a travel time by walking and riding
+# the transport routes that are running at the departure time, for planning the coverage of the routes
+# Runs a single search over the street graph joined with the routes, see get_isochrone_csgraph, and returns the
+# reachable areas either as a grid of cells with the travel time in minutes to each one, or as the outlines of
+# the cells reachable within each band of travel time if format is "polygons"
+@app.route("/isochrone", methods=["POST"])
+@jwt_required()
+def get_isochrone():
+    data = request.json
+
+    origin = data.get("origin", None)
+    route_area = data.get("route_area", None)
+    if has_missing_data([origin, route_area]) or not is_valid_pins([origin]):
+        return jsonify(msg="Bad Request: Incomplete data"), 400
+
+    isochrone_options = get_isochrone_options(data)
+    if isochrone_options is None:
+        return jsonify(msg="Bad Request: Invalid isochrone options"), 400
+    minutes, bands, area_format, cell_size = isochrone_options
+
+    departure_seconds = get_departure_seconds(data)
+    if departure_seconds is None:
+        return jsonify(msg="Bad Request: Invalid departure time"), 400
+
+    area_column, area_value = get_route_area_filter(route_area)
+
+    try:
+        # Load the routes that were contributed since the last request, then get the candidate routes, which are
+        # the routes within the vicinity that are available at the departure time, see get_directions
+        route_catalog.refresh(fetch_all, db.rollback)
+        index_key = route_catalog.get_index_key(area_column, area_value, departure_seconds)
+        transit_index = route_catalog.get_transit_index(area_column, area_value, departure_seconds)
+
+        # The street graph has to cover everywhere that the routes can take riders to within the travel time
+        network = street_tiles.get_network([origin] + get_reachable_bounds(origin, minutes * 60))
+        source = network.snap([origin])
+    except KeyError:
+        return jsonify(
+            msg="There is no map data that covers the given points.",
+        ), 404
+    except ValueError:
+        return jsonify(msg="Bad Request: Invalid origin"), 400
+    except:
+        return jsonify(
+            msg="There are no routes that can be reached from the origin",
+        ), 404
+
+    # The graph of the search only depends on the candidate routes and on the street graph, so it is shared by
+    # every isochrone with the same ones until a route is contributed
+    graph_key = (index_key, network.name, network.tile_names)
+    isochrone_csgraph = isochrone_graph_cache.get(graph_key)
+    if isochrone_csgraph is None:
+        isochrone_csgraph = get_isochrone_csgraph(network, transit_index)
+        isochrone_graph_cache.put(graph_key, isochrone_csgraph)
+
+    times = get_arrival_times(isochrone_csgraph, source, network.graph.node_count, minutes * 60)
+    reference_lat, cells = get_grid_cells(network.graph, times, minutes * 60, cell_size)
+
+    if area_format == "polygons":
+        return jsonify(
+            bands=[
+                {
+                    "minutes": band,
+                    "polygons": get_cell_polygons([cell for cell, time in cells.items() if time <= band * 60], reference_lat, cell_size),
+                }
+                for band in bands
+            ],
+        ), 200
+
+    centers = get_cell_centers(list(cells), reference_lat, cell_size)
+    return jsonify(
+        cell_size=cell_size,
+        cells=[
+            {"coords": center, "minutes": round(time / 60, 1)}
+            for center, time in zip(centers, cells.values())
+        ],
+    ), 200
+
+
+# Endpoint for checking the counters of the server's caches
+@app.route("/stats", methods=["GET"])
+@jwt_required()
+def get_stats():
+    return jsonify(
+        street_graph=street_tiles.get_stats(),
+        routes=route_catalog.get_stats(),
+        directions=directions_cache.get_stats(),
+        isochrone_graphs=isochrone_graph_cache.get_stats(),
+    ), 200
 
 
 # Endpoint for pinging the server periodically to keep it awake
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from graph_tiles import TileManager
+from transit import WALKING_TRANSFER_RADIUS, get_connections, unpack_nodes
+
+
+# Connect to the database of the API with the same settings
+def connect_database():
+    load_dotenv()
+    return mysql.connector.connect(
+        host=os.getenv("HOST"),
+        user=os.getenv("USERNAME"),
+        passwd=os.getenv("PASSWORD"),
+        database=os.getenv("DATABASE"),
+    )
+
+
+# Load the street graph tiles used by the API, or the single street graph if there are no tiles
+def load_street_tiles(tiles: str, graphml: str):
+    if TileManager.has_tiles(tiles):
+        return TileManager.load(tiles)
+
+    return TileManager.from_graphml(graphml)
+
+
+# Find where every stored route meets the other routes and where riders can walk between them within the walking
+# radius, and store them as the connections of each route
+# Routes added before their connections were stored only have them found for every request until this is run
+# Routes that were not migrated to nodes yet are left out, see migrate_route_nodes.py, and so are routes on streets
+# that are not in the street graph, since their coordinates are needed to find the walking transfers
+def backfill_connections(db, street_tiles: TileManager, missing_only=False, walking_radius=WALKING_TRANSFER_RADIUS):
+    cursor = db.cursor()
+    cursor.execute("SELECT id, nodes, connections FROM routes WHERE nodes IS NOT NULL")
+
+    results = []
+    routes = []
+    for res in cursor.fetchall():
+        nodes = unpack_nodes(res[1])
+        try:
+            coords = street_tiles.get_node_coords(nodes)
+        except KeyError:
+            continue
+
+        results.append(res)
+        routes.append({"id": res[0], "nodes": nodes, "coords": coords})
+
+    connections = get_connections(routes, walking_radius)
+
+    # Bump the data version so that the running API loads the updated routes
+    cursor.execute("UPDATE data_version SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+    cursor.execute("SELECT LAST_INSERT_ID()")
+    version = cursor.fetchone()[0]
+
+    updated = 0
+    for res, route_connections in zip(results, connections):
+        if missing_only and res[2]:
+            continue
+
+        cursor.execute("UPDATE routes SET connections=%s, version=%s WHERE id=%s", (json.dumps(route_connections), version, res[0]))
+        updated += 1
+
+    db.commit()
+    cursor.close()
+    return updated, len(routes)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Store where each transport route meets the other routes.")
+    parser.add_argument("--tiles", default="tiles", help="Directory of the street graph tiles used by the API.")
+    parser.add_argument("--graphml", default="batangas_city.graphml", help="GraphML file used by the API if there are no tiles.")
+    parser.add_argument("--walking-radius", type=float, default=float(os.getenv("WALKING_TRANSFER_RADIUS", WALKING_TRANSFER_RADIUS)), help="Farthest that riders walk in meters to transfer between routes.")
+    parser.add_argument("--missing-only", action="store_true", help="Only store the connections of routes that have none yet.")
+    args = parser.parse_args()
+
+    street_tiles = load_street_tiles(args.tiles, args.graphml)
+    db = connect_database()
+    updated, total = backfill_connections(db, street_tiles, args.missing_only, args.walking_radius)
+    print(f"Stored the connections of {updated} of {total} routes")
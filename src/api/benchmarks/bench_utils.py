@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+import time
+
+# Allow importing the API modules when running the benchmarks from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from transit import iter_complete_routes
+
+
+# Pick random origin-destination pairs of nodes from a graph snapshot
+def random_pairs(graph, count: int, seed=0):
+    generator = random.Random(seed)
+    return [(generator.randrange(graph.node_count), generator.randrange(graph.node_count)) for _ in range(count)]
+
+
+# Run a query for every pair and return the time each one took in milliseconds
+# Pairs that have no path are timed as well since the server has to answer those too
+def time_queries(query, pairs: list):
+    times = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        try:
+            query(source, target)
+        except Exception:
+            pass
+        times.append((time.perf_counter() - start) * 1000)
+
+    return times
+
+
+# Print the p50 and p99 of a list of query times
+def print_percentiles(name: str, times: list):
+    p50, p99 = np.percentile(times, [50, 99])
+    print(f"{name:<24}{p50:>12.3f}{p99:>12.3f}{sum(times) / 1000:>12.2f}")
+
+
+# Print the header of the table printed by print_percentiles
+def print_header():
+    print(f"{'engine':<24}{'p50 (ms)':>12}{'p99 (ms)':>12}{'total (s)':>12}")
+
+
+# Find all the route combinations of a route search at once, like the directions do before responding
+def get_complete_routes(transit_index, starts: dict, ends: dict, k: int, criterion="transfers", time_budget=None):
+    return list(iter_complete_routes(transit_index, starts, ends, k, criterion, time_budget))
@@ -0,0 +1,68 @@
+import argparse
+import time
+
+from bench_utils import print_header, print_percentiles, random_pairs, time_queries
+from contraction_hierarchy import build_hierarchy, get_hierarchy_path, save_hierarchy
+from graph_snapshot import load_meta, load_snapshot
+from street_routing import NoPathError, bidirectional_astar, dijkstra_path
+
+
+# Get the length of a path on a graph snapshot
+def get_path_length(graph, path: list):
+    length = 0.0
+    for u, v in zip(path, path[1:]):
+        neighbors, lengths = graph.neighbors(u)
+        length += lengths[neighbors.index(v)]
+
+    return length
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the build time, size and query speedup of the contraction hierarchy.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--pairs", type=int, default=500, help="Number of random origin-destination pairs.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the random pairs.")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.graphml)
+    print(f"{graph.node_count} nodes, {graph.edge_count} edges, snapshot is {graph.nbytes / 2**20:.2f} MiB")
+
+    start = time.perf_counter()
+    hierarchy = build_hierarchy(graph)
+    build_seconds = time.perf_counter() - start
+
+    hierarchy = save_hierarchy(hierarchy, graph, get_hierarchy_path(args.graphml), build_seconds)
+    shortcut_count = load_meta(hierarchy.path)["shortcuts"]
+    print(f"Built in {build_seconds:.1f}s, {hierarchy.nbytes / 2**20:.2f} MiB, {shortcut_count} shortcuts")
+
+    # Make sure the hierarchy finds paths as short as the ones found by A*
+    pairs = random_pairs(graph, args.pairs, args.seed)
+    mismatches = 0
+    for source, target in pairs:
+        try:
+            expected = get_path_length(graph, bidirectional_astar(graph, source, target))
+        except NoPathError:
+            expected = None
+
+        try:
+            actual = get_path_length(graph, hierarchy.shortest_path(source, target))
+        except NoPathError:
+            actual = None
+
+        if (expected is None) != (actual is None) or (expected is not None and abs(expected - actual) > 1e-3):
+            mismatches += 1
+
+    print(f"{mismatches} of {len(pairs)} paths differ in length from A*")
+
+    results = [
+        ("dijkstra", time_queries(lambda source, target: dijkstra_path(graph, source, target), pairs)),
+        ("bidirectional A*", time_queries(lambda source, target: bidirectional_astar(graph, source, target), pairs)),
+        ("contraction hierarchy", time_queries(hierarchy.shortest_path, pairs)),
+    ]
+
+    print_header()
+    for name, times in results:
+        print_percentiles(name, times)
+
+    baseline = sum(results[1][1])
+    print(f"Speedup over bidirectional A*: {baseline / sum(results[2][1]):.1f}x")
@@ -0,0 +1,98 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from bench_utils import get_complete_routes, print_header, print_percentiles
+from graph_snapshot import load_snapshot
+from isochrone import CELL_SIZE, get_arrival_times, get_cell_polygons, get_grid_cells, get_isochrone_csgraph
+from street_network import StreetNetwork
+from street_routing import NoPathError, bidirectional_astar
+from transit import TransitIndex, get_connections
+
+
+# Make random transport routes along the shortest paths between random nodes of the street graph, which are long
+# enough to be like jeepney routes across the city
+def random_street_routes(graph, count: int, min_length: int, seed=0):
+    generator = random.Random(seed)
+    node_ids = np.asarray(graph.node_ids)
+
+    routes = []
+    while len(routes) < count:
+        try:
+            path = bidirectional_astar(graph, generator.randrange(graph.node_count), generator.randrange(graph.node_count))
+        except NoPathError:
+            continue
+
+        if len(path) >= min_length:
+            routes.append({"id": len(routes), "nodes": node_ids[path].tolist(), "coords": graph.get_coords(path)})
+
+    return routes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the isochrone search against one route search for every reachable destination.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--routes", type=int, default=100, help="Number of random transport routes along the streets.")
+    parser.add_argument("--origins", type=int, default=20, help="Number of random origins.")
+    parser.add_argument("--minutes", type=float, default=45, help="Travel time of each isochrone in minutes.")
+    parser.add_argument("--cell-size", type=float, default=CELL_SIZE, help="Size of the cells of the isochrones in meters.")
+    parser.add_argument("--directions-sample", type=int, default=20, help="Number of destinations of each origin to time the route search on.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for making the random routes and origins.")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.graphml)
+    network = StreetNetwork(graph)
+    routes = random_street_routes(graph, args.routes, 20, args.seed)
+    transit_index = TransitIndex(routes, get_connections(routes))
+    print(f"{graph.node_count} nodes, {graph.edge_count} edges, {len(routes)} routes")
+
+    generator = random.Random(args.seed + 1)
+    origins = [generator.choice(generator.choice(routes)["nodes"]) for _ in range(args.origins)]
+    max_seconds = args.minutes * 60
+
+    build_times = []
+    search_times = []
+    grid_times = []
+    polygon_times = []
+    directions_times = []
+    cell_counts = []
+    for origin in origins:
+        start = time.perf_counter()
+        isochrone_csgraph = get_isochrone_csgraph(network, transit_index)
+        build_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        times = get_arrival_times(isochrone_csgraph, [graph.node_index(origin)], graph.node_count, max_seconds)
+        search_times.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        reference_lat, cells = get_grid_cells(graph, times, max_seconds, args.cell_size)
+        grid_times.append((time.perf_counter() - start) * 1000)
+        cell_counts.append(len(cells))
+
+        start = time.perf_counter()
+        get_cell_polygons(cells, reference_lat, args.cell_size)
+        polygon_times.append((time.perf_counter() - start) * 1000)
+
+        # Without the isochrone, every reachable cell would need its own route search from the origin
+        reached = [node_id for node_id in np.asarray(graph.node_ids)[np.isfinite(times)].tolist() if node_id in transit_index]
+        for destination in generator.sample(reached, min(args.directions_sample, len(reached))):
+            start = time.perf_counter()
+            get_complete_routes(transit_index, {origin: 0.0}, {destination: 0.0}, 1)
+            directions_times.append((time.perf_counter() - start) * 1000)
+
+    print_header()
+    print_percentiles("build graph", build_times)
+    print_percentiles("search", search_times)
+    print_percentiles("grid", grid_times)
+    print_percentiles("polygons", polygon_times)
+    isochrone_ms = np.asarray(build_times) + np.asarray(search_times) + np.asarray(grid_times)
+    print_percentiles("isochrone", isochrone_ms.tolist())
+    print(f"{'':<24}{np.mean(cell_counts):.0f} cells of {args.cell_size:.0f} m reached within {args.minutes:g} minutes on average")
+
+    if len(directions_times) > 0:
+        print_percentiles("route search", directions_times)
+        estimate_ms = np.mean(directions_times) * np.mean(cell_counts)
+        print(f"{'':<24}one route search for every cell would take about {estimate_ms / 1000:.1f} s per origin")
@@ -0,0 +1,65 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from contraction import get_path_length
+from distance_matrix import get_csgraph, get_distance_matrix
+from graph_snapshot import load_snapshot
+from street_routing import NoPathError, bidirectional_astar
+
+
+# Get the distance matrix with one bidirectional A* search for every pair of points
+def get_pairwise_matrix(graph, sources: list, targets: list):
+    distances = np.full((len(sources), len(targets)), np.inf)
+    for row, source in enumerate(sources):
+        for column, target in enumerate(targets):
+            try:
+                distances[row, column] = get_path_length(graph, bidirectional_astar(graph, source, target))
+            except NoPathError:
+                pass
+
+    return distances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the distance matrix search against one search per pair of points.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--points", type=int, default=200, help="Number of random points used as both origins and destinations.")
+    parser.add_argument("--pairwise-points", type=int, default=30, help="Number of points for the pairwise loop, which is much slower.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the random points.")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.graphml)
+    print(f"{graph.node_count} nodes, {graph.edge_count} edges")
+
+    generator = random.Random(args.seed)
+    points = [generator.randrange(graph.node_count) for _ in range(args.points)]
+    pairwise_points = points[:args.pairwise_points]
+
+    start = time.perf_counter()
+    csgraph = get_csgraph(graph)
+    print(f"Built the sparse matrix in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    expected = get_pairwise_matrix(graph, pairwise_points, pairwise_points)
+    pairwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = get_distance_matrix(csgraph, pairwise_points, pairwise_points)
+    matrix_seconds = time.perf_counter() - start
+
+    # Make sure both give the same distances, including which pairs have no path
+    same = np.isclose(expected, actual, rtol=1e-6) | (np.isinf(expected) & np.isinf(actual))
+    print(f"{np.count_nonzero(~same)} of {same.size} distances differ from the pairwise loop")
+
+    start = time.perf_counter()
+    get_distance_matrix(csgraph, points, points)
+    full_seconds = time.perf_counter() - start
+
+    print(f"{'method':<24}{'points':>12}{'time (s)':>12}{'distances/s':>14}")
+    print(f"{'pairwise A*':<24}{len(pairwise_points):>12}{pairwise_seconds:>12.3f}{expected.size / pairwise_seconds:>14.0f}")
+    print(f"{'one-to-many dijkstra':<24}{len(pairwise_points):>12}{matrix_seconds:>12.3f}{actual.size / matrix_seconds:>14.0f}")
+    print(f"{'one-to-many dijkstra':<24}{len(points):>12}{full_seconds:>12.3f}{len(points) ** 2 / full_seconds:>14.0f}")
+    print(f"Throughput over the pairwise loop: {(len(points) ** 2 / full_seconds) / (expected.size / pairwise_seconds):.1f}x")
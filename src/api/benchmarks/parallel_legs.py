@@ -0,0 +1,63 @@
+import argparse
+import os
+import random
+import time
+
+from bench_utils import print_header, print_percentiles
+from graph_tiles import TileManager
+from leg_pool import LegPool
+
+
+# Pick random routes of nodes that all lie on the same network
+def random_routes(network, count: int, legs: int, seed=0):
+    generator = random.Random(seed)
+    return [[generator.randrange(network.graph.node_count) for _ in range(legs + 1)] for _ in range(count)]
+
+
+# Compute every leg of every route and return the time each route took in milliseconds
+# Routes are never repeated so that the path caches of the server and of the workers never help
+def time_routes(leg_pool: LegPool, network, routes: list):
+    times = []
+    for nodes in routes:
+        start = time.perf_counter()
+        try:
+            leg_pool.get_leg_paths(network, nodes)
+        except Exception:
+            pass
+        times.append((time.perf_counter() - start) * 1000)
+
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how computing the legs of long routes scales with the number of processes.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--routes", type=int, default=20, help="Number of random routes for each number of processes.")
+    parser.add_argument("--legs", type=int, default=64, help="Number of legs of each route.")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1, help="Largest number of processes to measure.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the random routes.")
+    args = parser.parse_args()
+
+    street_tiles = TileManager.from_graphml(args.graphml)
+    network = street_tiles.get_tiles_network([tile["name"] for tile in street_tiles.tiles])
+    engine = "contraction hierarchy" if network.hierarchy is not None else "bidirectional A*"
+    print(f"{network.graph.node_count} nodes, {args.legs} legs per route, using {engine}")
+
+    results = []
+    for processes in range(1, args.max_processes + 1):
+        leg_pool = LegPool(street_tiles, processes, threshold=0)
+
+        # Start the workers and let them load the graph before timing anything
+        leg_pool.get_leg_paths(network, random_routes(network, 1, processes * 2, args.seed + 1)[0])
+
+        routes = random_routes(network, args.routes, args.legs, args.seed + 1 + processes)
+        results.append((processes, time_routes(leg_pool, network, routes)))
+        leg_pool.shutdown()
+
+    print_header()
+    for processes, times in results:
+        print_percentiles(f"{processes} processes", times)
+
+    baseline = sum(results[0][1])
+    for processes, times in results[1:]:
+        print(f"Speedup with {processes} processes: {baseline / sum(times):.2f}x")
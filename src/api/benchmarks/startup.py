@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Allow importing the API modules when running this script from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Get the resident set size of the current process in MiB
+def get_rss():
+    with open("/proc/self/statm") as file:
+        pages = int(file.read().split()[1])
+
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+# Load the graph with one of the loaders and report how long it took and how much memory it used
+# Runs inside a fresh child process so that the loaders do not affect each other's measurements
+def measure(loader: str, graphml_path: str):
+    rss_before = get_rss()
+    start = time.perf_counter()
+
+    if loader == "graphml":
+        import osmnx as ox
+
+        graph = ox.load_graphml(graphml_path)
+        load_time = time.perf_counter() - start
+        node = next(iter(graph.nodes))
+        graph.nodes[node]["y"]
+
+    else:
+        from graph_snapshot import GraphSnapshot, get_snapshot_path
+
+        graph = GraphSnapshot.load(get_snapshot_path(graphml_path))
+        load_time = time.perf_counter() - start
+
+        # Touch the coordinates the same way a nearest node lookup would
+        graph.nearest_node(float(graph.lat[0]), float(graph.lon[0]))
+
+    first_query_time = time.perf_counter() - start
+
+    return {
+        "loader": loader,
+        "load_ms": load_time * 1000,
+        "first_query_ms": first_query_time * 1000,
+        "rss_mib": get_rss() - rss_before,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the startup time and memory of the GraphML loader and the graph snapshot.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of runs for each loader.")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.graphml)))
+        sys.exit()
+
+    # Make sure the snapshot exists before timing it
+    from graph_snapshot import build_snapshot_from_graphml, get_snapshot_path
+    if not os.path.exists(get_snapshot_path(args.graphml)):
+        build_snapshot_from_graphml(args.graphml)
+
+    print(f"{'loader':<10}{'load (ms)':>12}{'first query (ms)':>18}{'RSS (MiB)':>12}{'peak RSS (MiB)':>16}")
+    for loader in ("graphml", "snapshot"):
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), args.graphml, "--child", loader],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{loader:<10}{result['load_ms']:>12.1f}{result['first_query_ms']:>18.1f}{result['rss_mib']:>12.1f}{result['peak_rss_mib']:>16.1f}")
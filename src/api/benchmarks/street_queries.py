@@ -0,0 +1,36 @@
+import argparse
+
+from bench_utils import print_header, print_percentiles, random_pairs, time_queries
+from graph_snapshot import load_snapshot
+from street_routing import bidirectional_astar, dijkstra_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the query times of the street shortest path engines.")
+    parser.add_argument("graphml", nargs="?", default="batangas_city.graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("--pairs", type=int, default=500, help="Number of random origin-destination pairs.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the random pairs.")
+    parser.add_argument("--skip-networkx", action="store_true", help="Do not time nx.shortest_path on the GraphML graph.")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.graphml)
+    pairs = random_pairs(graph, args.pairs, args.seed)
+    print(f"{graph.node_count} nodes, {graph.edge_count} edges, {len(pairs)} pairs")
+
+    engines = []
+
+    # The call the endpoints used before the snapshot, on the graph loaded from the GraphML file
+    if not args.skip_networkx:
+        import networkx as nx
+        import osmnx as ox
+
+        nx_graph = ox.load_graphml(args.graphml)
+        node_ids = graph.node_ids.tolist()
+        engines.append(("nx.shortest_path", lambda source, target: nx.shortest_path(nx_graph, node_ids[source], node_ids[target], weight="length")))
+
+    engines.append(("dijkstra", lambda source, target: dijkstra_path(graph, source, target)))
+    engines.append(("bidirectional A*", lambda source, target: bidirectional_astar(graph, source, target)))
+
+    print_header()
+    for name, query in engines:
+        print_percentiles(name, time_queries(query, pairs))
@@ -0,0 +1,179 @@
+import argparse
+import json
+import random
+import time
+
+from bench_utils import get_complete_routes, print_header, print_percentiles
+from transit import RANKINGS, WALKING_TRANSFER_RADIUS, TransitIndex, get_connections, pack_nodes, unpack_nodes
+
+
+# Make random transport routes that wander around a grid of intersections, like jeepney routes along city streets
+# The node id of each intersection is its position in the grid
+def random_routes(count: int, grid_size: int, min_length: int, max_length: int, seed=0):
+    generator = random.Random(seed)
+    steps = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+    routes = []
+    for route_id in range(count):
+        row, column = generator.randrange(grid_size), generator.randrange(grid_size)
+        nodes = [row * grid_size + column]
+        coords = [[13.75 + row * 0.001, 121.05 + column * 0.001]]
+        direction = generator.randrange(4)
+        for _ in range(generator.randint(min_length, max_length)):
+            # Mostly keep going straight, sometimes turn, and never turn back
+            if generator.random() < 0.3:
+                direction = (direction + generator.choice((1, 3))) % 4
+            row = min(max(row + steps[direction][0], 0), grid_size - 1)
+            column = min(max(column + steps[direction][1], 0), grid_size - 1)
+            nodes.append(row * grid_size + column)
+            coords.append([13.75 + row * 0.001, 121.05 + column * 0.001])
+
+        routes.append({"id": route_id, "name": f"Route {route_id}", "nodes": nodes, "coords": coords})
+
+    return routes
+
+
+# Pick random pairs of points that are on the routes, each one as its node id and its coordinates
+def random_queries(routes: list, count: int, seed=0):
+    generator = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        points = []
+        for route in (generator.choice(routes), generator.choice(routes)):
+            position = generator.randrange(len(route["nodes"]))
+            points.append((route["nodes"][position], route["coords"][position]))
+        queries.append(tuple(points))
+
+    return queries
+
+
+# Measure the size of the stored routes and the time to read them back, as JSON coordinates and as packed node ids
+def measure_storage(routes: list):
+    results = []
+    for name, encode, decode in (
+        ("coords as JSON", lambda route: json.dumps(route["coords"]), json.loads),
+        ("packed node ids", lambda route: pack_nodes(route["nodes"]), unpack_nodes),
+    ):
+        stored = [encode(route) for route in routes]
+        start = time.perf_counter()
+        for data in stored:
+            decode(data)
+        results.append((name, sum(len(data) for data in stored), (time.perf_counter() - start) * 1000))
+
+    return results
+
+
+# Previous route finding, which paired every route combination with every candidate route at most 5 times
+def get_legacy_routes(candidate_routes, start, end):
+    start_routes = []
+    end_routes = []
+    for candidate_route in candidate_routes:
+        for i, coord in enumerate(candidate_route["coords"]):
+            if start == coord:
+                start_routes.append(dict(candidate_route, coords=candidate_route["coords"][i:]))
+            if end == coord:
+                end_routes.append(dict(candidate_route, coords=candidate_route["coords"][:i + 1]))
+
+    complete_routes = []
+    for start_route in start_routes:
+        for i, coord in enumerate(start_route["coords"]):
+            if end == coord:
+                complete_routes.append([dict(start_route, coords=start_route["coords"][:i + 1])])
+                break
+
+    if len(complete_routes) > 0:
+        return complete_routes
+
+    start_network = [[route] for route in start_routes]
+    end_network = [[route] for route in end_routes]
+    full_network = [[route] for route in candidate_routes]
+    for i in range(5):
+        complete_routes = get_legacy_connected_routes(start_network, end_network)
+        if len(complete_routes) > 0:
+            return complete_routes
+
+        if i % 2 == 0:
+            start_network = get_legacy_connected_routes(start_network, full_network)
+        else:
+            end_network = get_legacy_connected_routes(full_network, end_network)
+
+        if len(start_network) == 0 or len(end_network) == 0:
+            return complete_routes
+
+    return []
+
+
+# Previous pairing of route combinations, comparing every coordinate of one route with every coordinate of the other
+def get_legacy_connected_routes(network_a: list, network_b: list):
+    results = []
+    for leg_a in network_a:
+        for leg_b in network_b:
+            end_a = leg_a[-1]
+            end_b = leg_b[0]
+            if end_a["id"] == end_b["id"]:
+                continue
+
+            connection = next(
+                ((i, j) for i, coord_a in enumerate(end_a["coords"]) for j, coord_b in enumerate(end_b["coords"]) if coord_a == coord_b),
+                None,
+            )
+            if connection is not None:
+                i, j = connection
+                sliced_end_a = dict(end_a, coords=end_a["coords"][:i + 1])
+                sliced_end_b = dict(end_b, coords=end_b["coords"][j:])
+                results.append(leg_a[:-1] + [sliced_end_a, sliced_end_b] + leg_b[1:])
+
+    return results
+
+
+# Run every query and return the time each one took in milliseconds along with the number of queries with results
+def time_route_finding(find_routes, queries: list):
+    times = []
+    found = 0
+    for start, end in queries:
+        query_start = time.perf_counter()
+        if find_routes(start, end):
+            found += 1
+        times.append((time.perf_counter() - query_start) * 1000)
+
+    return times, found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how route finding scales with the number of transport routes.")
+    parser.add_argument("--route-counts", type=int, nargs="+", default=[50, 100, 200, 400, 800], help="Numbers of routes to measure.")
+    parser.add_argument("--queries", type=int, default=50, help="Number of random queries for each number of routes.")
+    parser.add_argument("--grid-size", type=int, default=60, help="Number of intersections along each side of the grid.")
+    parser.add_argument("--legacy-max-routes", type=int, default=100, help="Largest number of routes to run the previous route finding on.")
+    parser.add_argument("--k", type=int, default=5, help="Number of route combinations to find for each query.")
+    parser.add_argument("--criterion", choices=list(RANKINGS), default="transfers", help="Ranking of the route combinations.")
+    parser.add_argument("--time-budget", type=float, default=None, help="Time budget of each query in seconds.")
+    parser.add_argument("--walking-radius", type=float, default=WALKING_TRANSFER_RADIUS, help="Farthest walk in meters to transfer between routes, 0 for none.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for making the random routes and queries.")
+    args = parser.parse_args()
+
+    print_header()
+    for count in args.route_counts:
+        routes = random_routes(count, args.grid_size, 40, 120, args.seed)
+        queries = random_queries(routes, args.queries, args.seed + 1)
+
+        # Connections are stored with the routes when they are contributed, so they are found before timing
+        start = time.perf_counter()
+        connections = get_connections(routes, args.walking_radius)
+        connections_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        transit_index = TransitIndex(routes, connections, args.walking_radius)
+        index_ms = (time.perf_counter() - start) * 1000
+
+        find_routes = lambda start, end: get_complete_routes(transit_index, {start[0]: 0.0}, {end[0]: 0.0}, args.k, args.criterion, args.time_budget)
+        times, found = time_route_finding(find_routes, queries)
+        print_percentiles(f"{count} routes", times)
+        print(f"{'':<24}connections found in {connections_ms:.1f} ms, index built in {index_ms:.1f} ms, {found} of {len(queries)} queries connected")
+        for name, size, parse_ms in measure_storage(routes):
+            print(f"{'':<24}{name}: {size / 1024:.1f} KiB, read in {parse_ms:.1f} ms")
+
+        if count <= args.legacy_max_routes:
+            times, found = time_route_finding(lambda start, end: get_legacy_routes(routes, start[1], end[1]), queries)
+            print_percentiles(f"{count} routes (previous)", times)
+            print(f"{'':<24}{found} of {len(queries)} queries connected")
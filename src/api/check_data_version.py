@@ -0,0 +1,69 @@
+import argparse
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from backfill_connections import connect_database, load_street_tiles
+from route_catalog import RouteCatalog
+
+
+# Get the data version committed to the database with a new connection, which cannot read an old snapshot
+def get_committed_version():
+    db = connect_database()
+    cursor = db.cursor()
+    cursor.execute("SELECT version FROM data_version WHERE id = 1")
+    version = cursor.fetchone()[0]
+    cursor.close()
+    db.close()
+    return version
+
+
+# Check that the route catalog of a worker sees the data version bumped by other workers without writing anything
+# The catalog refreshes on a single connection like a worker does, and after each refresh it must have at least the
+# version that a new connection saw committed right before it, which fails once routes are contributed to another
+# worker while the catalog keeps reading an old snapshot
+# Checks every interval seconds for duration seconds and returns (committed, catalog) for the first refresh that
+# missed the committed version, or None if none did
+def check_data_version(street_tiles, duration: float, interval: float):
+    reader = connect_database()
+    reader_cursor = reader.cursor()
+
+    def fetch_all(query, params=tuple()):
+        reader_cursor.execute(query, params)
+        return reader_cursor.fetchall()
+
+    route_catalog = RouteCatalog(street_tiles)
+    deadline = time.monotonic() + duration
+    stale = None
+    while stale is None:
+        committed = get_committed_version()
+        route_catalog.refresh(fetch_all, reader.rollback)
+        if route_catalog.version < committed:
+            stale = (committed, route_catalog.version)
+
+        if time.monotonic() + interval > deadline:
+            break
+        time.sleep(interval)
+
+    reader.rollback()
+    reader_cursor.close()
+    reader.close()
+    return stale
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Check that the route catalog sees the data version bumped by other connections, without writing to the database.")
+    parser.add_argument("--tiles", default="tiles", help="Directory of the street graph tiles used by the API.")
+    parser.add_argument("--graphml", default="batangas_city.graphml", help="GraphML file used by the API if there are no tiles.")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to keep checking for, such as while routes are being contributed.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between the checks.")
+    args = parser.parse_args()
+
+    stale = check_data_version(load_street_tiles(args.tiles, args.graphml), args.duration, args.interval)
+    if stale is not None:
+        print(f"The route catalog kept version {stale[1]} after version {stale[0]} was committed")
+        sys.exit(1)
+
+    print("The route catalog saw every committed data version")
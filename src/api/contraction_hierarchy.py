@@ -0,0 +1,366 @@
+import argparse
+import heapq
+import os
+import time
+
+import numpy as np
+
+from graph_snapshot import build_csr, load_arrays, load_meta, load_snapshot, save_arrays
+from street_routing import NoPathError
+
+
+# Version of the hierarchy layout, bump this whenever the arrays written by build_hierarchy change
+HIERARCHY_VERSION = 1
+
+# Arrays that make up a hierarchy, stored next to the graph snapshot the same way
+ARRAY_NAMES = (
+    "rank",
+    "up_indptr", "up_indices", "up_lengths", "up_middles",
+    "down_indptr", "down_indices", "down_lengths", "down_middles",
+)
+
+# Maximum number of nodes a witness search settles before giving up
+# Giving up early only adds shortcuts that are not strictly needed, so the hierarchy stays exact
+WITNESS_SETTLED_LIMIT = 500
+
+
+# Contraction hierarchy of a graph snapshot
+# Every node has a rank, and the shortest path between any two nodes can be found by searching only edges
+# that lead to higher ranked nodes from both ends. The "up" edges are the outgoing edges of a node to higher
+# ranked nodes, and the "down" edges are the incoming edges of a node from higher ranked nodes
+# Shortcut edges store the node they skip over as their middle node, which is -1 for original edges
+class ContractionHierarchy():
+    def __init__(self, arrays: dict, path=None):
+        self.path = path
+        self.rank = arrays["rank"]
+
+        self.up_indptr = arrays["up_indptr"]
+        self.up_indices = arrays["up_indices"]
+        self.up_lengths = arrays["up_lengths"]
+        self.up_middles = arrays["up_middles"]
+
+        self.down_indptr = arrays["down_indptr"]
+        self.down_indices = arrays["down_indices"]
+        self.down_lengths = arrays["down_lengths"]
+        self.down_middles = arrays["down_middles"]
+
+
+    @classmethod
+    def load(cls, path: str):
+        meta = load_meta(path)
+        if meta.get("version") != HIERARCHY_VERSION:
+            raise ValueError(f"Contraction hierarchy at {path} is outdated, rebuild it with contraction_hierarchy.py")
+
+        return cls(load_arrays(path, ARRAY_NAMES), path)
+
+
+    # Total size of the arrays in bytes
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+
+    # Get the edges from a node to higher ranked nodes
+    def upward(self, node: int):
+        start = self.up_indptr[node]
+        end = self.up_indptr[node + 1]
+        return self.up_indices[start:end].tolist(), self.up_lengths[start:end].tolist(), self.up_middles[start:end].tolist()
+
+
+    # Get the edges to a node from higher ranked nodes
+    def downward(self, node: int):
+        start = self.down_indptr[node]
+        end = self.down_indptr[node + 1]
+        return self.down_indices[start:end].tolist(), self.down_lengths[start:end].tolist(), self.down_middles[start:end].tolist()
+
+
+    # Find the shortest path between two nodes by searching upwards from both of them
+    def shortest_path(self, source: int, target: int):
+        if source == target:
+            return [source]
+
+        # Each search stores the distance of every node it reached and the edge it was reached with
+        forward_distances = {source: 0.0}
+        backward_distances = {target: 0.0}
+        forward_edges = {source: None}
+        backward_edges = {target: None}
+        forward_queue = [(0.0, source)]
+        backward_queue = [(0.0, target)]
+
+        best_distance = float("inf")
+        meeting_node = None
+
+        while forward_queue or backward_queue:
+            # Searches stop on their own once their closest node is farther than the best path found
+            if forward_queue and forward_queue[0][0] >= best_distance:
+                forward_queue = []
+            if backward_queue and backward_queue[0][0] >= best_distance:
+                backward_queue = []
+
+            # Expand the search whose next node is closer
+            if forward_queue and (not backward_queue or forward_queue[0][0] <= backward_queue[0][0]):
+                queue, distances, edges, other_distances = forward_queue, forward_distances, forward_edges, backward_distances
+                get_edges, get_stall_edges = self.upward, self.downward
+            elif backward_queue:
+                queue, distances, edges, other_distances = backward_queue, backward_distances, backward_edges, forward_distances
+                get_edges, get_stall_edges = self.downward, self.upward
+            else:
+                break
+
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+
+            if node in other_distances and distance + other_distances[node] < best_distance:
+                best_distance = distance + other_distances[node]
+                meeting_node = node
+
+            # Stall on demand: skip the node if a higher ranked node already reaches it with a shorter distance,
+            # since then no shortest path goes up through it
+            stalled = False
+            for neighbor, length, _ in zip(*get_stall_edges(node)):
+                if distances.get(neighbor, float("inf")) + length < distance:
+                    stalled = True
+                    break
+
+            if stalled:
+                continue
+
+            for neighbor, length, middle in zip(*get_edges(node)):
+                new_distance = distance + length
+                if new_distance < distances.get(neighbor, float("inf")):
+                    distances[neighbor] = new_distance
+                    edges[neighbor] = (node, middle)
+                    heapq.heappush(queue, (new_distance, neighbor))
+
+        if meeting_node is None:
+            raise NoPathError(f"No path from node {source} to node {target}")
+
+        # Collect the edges of the path from the source up to the meeting node and down to the target
+        path_edges = []
+        node = meeting_node
+        while forward_edges[node] is not None:
+            previous, middle = forward_edges[node]
+            path_edges.append((previous, node, middle))
+            node = previous
+        path_edges.reverse()
+
+        node = meeting_node
+        while backward_edges[node] is not None:
+            following, middle = backward_edges[node]
+            path_edges.append((node, following, middle))
+            node = following
+
+        # Replace the shortcuts with the original edges they stand for
+        path = [source]
+        for edge in path_edges:
+            path += self.unpack_edge(*edge)
+
+        return path
+
+
+    # Get the nodes that an edge passes through, excluding its first node
+    def unpack_edge(self, u: int, v: int, middle: int):
+        nodes = []
+        stack = [(u, v, middle)]
+
+        while stack:
+            u, v, middle = stack.pop()
+            if middle == -1:
+                nodes.append(v)
+                continue
+
+            # The middle node was contracted before both ends, so the edge from u to the middle node is one of
+            # its downward edges and the edge from the middle node to v is one of its upward edges
+            # Push the second half first so the first half is unpacked first
+            stack.append((middle, v, self.find_middle(self.upward(middle), v)))
+            stack.append((u, middle, self.find_middle(self.downward(middle), u)))
+
+        return nodes
+
+
+    # Find the middle node of the edge to a neighbor from a list of edges
+    @staticmethod
+    def find_middle(edges, neighbor: int):
+        for other, _, middle in zip(*edges):
+            if other == neighbor:
+                return middle
+
+        raise KeyError(neighbor)
+
+
+# Build a contraction hierarchy from a graph snapshot
+def build_hierarchy(graph, settled_limit=WITNESS_SETTLED_LIMIT):
+    node_count = graph.node_count
+
+    # Remaining graph while contracting, as dictionaries of neighbor to (length, middle node)
+    out_edges = [{} for _ in range(node_count)]
+    in_edges = [{} for _ in range(node_count)]
+    for u in range(node_count):
+        for v, length in zip(*graph.neighbors(u)):
+            out_edges[u][v] = (length, -1)
+            in_edges[v][u] = (length, -1)
+
+    # Search for a path from a node to each target that avoids the node being contracted
+    # and is not longer than the path through it
+    def witness_search(source, excluded, targets, limit):
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        remaining = set(targets)
+        settled = 0
+
+        while queue and remaining and settled < settled_limit:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+
+            if distance > limit:
+                break
+
+            remaining.discard(node)
+            settled += 1
+
+            for neighbor, (length, _) in out_edges[node].items():
+                if neighbor == excluded:
+                    continue
+
+                new_distance = distance + length
+                if new_distance < distances.get(neighbor, float("inf")):
+                    distances[neighbor] = new_distance
+                    heapq.heappush(queue, (new_distance, neighbor))
+
+        return distances
+
+    # Get the shortcuts needed to keep all shortest paths when a node is removed
+    def find_shortcuts(node):
+        shortcuts = []
+        for u, (in_length, _) in in_edges[node].items():
+            targets = {w: in_length + out_length for w, (out_length, _) in out_edges[node].items() if w != u}
+            if len(targets) == 0:
+                continue
+
+            distances = witness_search(u, node, targets, max(targets.values()))
+            for w, length in targets.items():
+                if distances.get(w, float("inf")) > length:
+                    shortcuts.append((u, w, length))
+
+        return shortcuts
+
+    # Nodes that add fewer edges than they remove go first, while nodes whose neighbors were already contracted
+    # or that sit on top of many contracted nodes are pushed back to spread the contraction evenly over the graph
+    deleted_neighbors = [0] * node_count
+    levels = [0] * node_count
+
+    def get_priority(node, shortcuts):
+        edge_difference = len(shortcuts) - len(in_edges[node]) - len(out_edges[node])
+        return 2 * edge_difference + deleted_neighbors[node] + levels[node]
+
+    queue = [(get_priority(node, find_shortcuts(node)), node) for node in range(node_count)]
+    heapq.heapify(queue)
+
+    rank = np.zeros(node_count, dtype=np.int32)
+    up_edges = []
+    down_edges = []
+    next_rank = 0
+
+    while queue:
+        _, node = heapq.heappop(queue)
+
+        # Priorities change as the graph gets contracted, so recompute it and put the node back if it is
+        # no longer the best one to contract
+        shortcuts = find_shortcuts(node)
+        priority = get_priority(node, shortcuts)
+        if queue and priority > queue[0][0]:
+            heapq.heappush(queue, (priority, node))
+            continue
+
+        rank[node] = next_rank
+        next_rank += 1
+
+        # The remaining edges of the node all lead to nodes that will be ranked higher
+        for w, (length, middle) in out_edges[node].items():
+            up_edges.append((node, w, length, middle))
+            del in_edges[w][node]
+            deleted_neighbors[w] += 1
+            levels[w] = max(levels[w], levels[node] + 1)
+
+        for u, (length, middle) in in_edges[node].items():
+            down_edges.append((node, u, length, middle))
+            del out_edges[u][node]
+            deleted_neighbors[u] += 1
+            levels[u] = max(levels[u], levels[node] + 1)
+
+        out_edges[node] = {}
+        in_edges[node] = {}
+
+        for u, w, length in shortcuts:
+            if w not in out_edges[u] or length < out_edges[u][w][0]:
+                out_edges[u][w] = (length, node)
+                in_edges[w][u] = (length, node)
+
+    arrays = {"rank": rank}
+    for prefix, edges in (("up", up_edges), ("down", down_edges)):
+        sources = np.array([edge[0] for edge in edges], dtype=np.int64)
+        targets = np.array([edge[1] for edge in edges], dtype=np.int64)
+        lengths = np.array([edge[2] for edge in edges], dtype=np.float64)
+        middles = np.array([edge[3] for edge in edges], dtype=np.int32)
+
+        indptr, indices, lengths, middles = build_csr(sources, targets, node_count, lengths, middles)
+
+        arrays[f"{prefix}_indptr"] = indptr
+        arrays[f"{prefix}_indices"] = indices
+        arrays[f"{prefix}_lengths"] = lengths
+        arrays[f"{prefix}_middles"] = middles
+
+    return ContractionHierarchy(arrays)
+
+
+# Get the default location of the hierarchy of a GraphML file, which is right next to it
+def get_hierarchy_path(graphml_path: str):
+    return os.path.splitext(graphml_path)[0] + ".ch"
+
+
+# Save a contraction hierarchy along with the graph snapshot it was built from
+def save_hierarchy(hierarchy, graph, path: str, build_seconds=None):
+    shortcut_count = int(np.count_nonzero(np.asarray(hierarchy.up_middles) != -1) + np.count_nonzero(np.asarray(hierarchy.down_middles) != -1))
+    meta = {
+        "version": HIERARCHY_VERSION,
+        "nodes": graph.node_count,
+        "edges": graph.edge_count,
+        "shortcuts": shortcut_count,
+        "build_seconds": build_seconds,
+    }
+
+    save_arrays(path, {name: getattr(hierarchy, name) for name in ARRAY_NAMES}, meta)
+    return ContractionHierarchy.load(path)
+
+
+# Load a contraction hierarchy if it was built for the given graph snapshot
+# Returns None if it does not exist or is outdated, in which case the street paths are found with A* instead
+def load_hierarchy(path: str, graph):
+    try:
+        meta = load_meta(path)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != HIERARCHY_VERSION or meta.get("nodes") != graph.node_count or meta.get("edges") != graph.edge_count:
+        print(f"Ignoring outdated contraction hierarchy at {path}")
+        return None
+
+    return ContractionHierarchy.load(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the contraction hierarchy of a street graph.")
+    parser.add_argument("graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("-o", "--output", default=None, help="Directory to write the hierarchy to.")
+    args = parser.parse_args()
+
+    graph = load_snapshot(args.graphml)
+
+    start = time.perf_counter()
+    hierarchy = build_hierarchy(graph)
+    build_seconds = time.perf_counter() - start
+
+    hierarchy = save_hierarchy(hierarchy, graph, args.output or get_hierarchy_path(args.graphml), build_seconds)
+    print(f"Built contraction hierarchy in {build_seconds:.1f}s ({hierarchy.nbytes / 2**20:.1f} MiB) at {hierarchy.path}")
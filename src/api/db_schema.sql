@@ -1,3 +1,11 @@
+CREATE TABLE `data_version` (
+	`id` int NOT NULL,
+	`version` bigint NOT NULL DEFAULT 0,
+	PRIMARY KEY (`id`)
+);
+
+INSERT INTO `data_version` (`id`, `version`) VALUES (1, 0);
+
 CREATE TABLE `ping` (
 	`count` int NOT NULL AUTO_INCREMENT,
 	PRIMARY KEY (`count`)
@@ -24,8 +32,10 @@ CREATE TABLE `routes` (
 	`start_time` time,
 	`end_time` time,
 	`coords` json,
+	`nodes` longblob,
 	`connections` json,
 	`uploader_id` int,
+	`version` bigint NOT NULL DEFAULT 0,
 	PRIMARY KEY (`id`)
 );
 
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+
+# Largest number of distances computed at once by a chunk of one-to-many searches, which bounds the memory
+# of each chunk to about 64 MiB since each search gives the distances to every node of the graph
+CHUNK_DISTANCES = 8_000_000
+
+
+# Get the street graph of a snapshot as a sparse matrix of edge lengths for the scipy graph algorithms
+# The arrays of the snapshot are already in the compressed sparse row layout, so they are used as they are
+def get_csgraph(graph):
+    return csr_matrix(
+        (np.asarray(graph.lengths, dtype=np.float64), np.asarray(graph.indices), np.asarray(graph.indptr)),
+        shape=(graph.node_count, graph.node_count),
+    )
+
+
+# Get the shortest distance in meters from every source node to every target node
+# Runs one Dijkstra search from each distinct source that stops at max_distance, in chunks of sources so
+# that the distances to every node of the graph never have to be kept for all the sources at once
+# Unreachable targets and targets farther than max_distance get an infinite distance
+# Walking distances should ignore one-way streets, which is done by setting directed to False
+def get_distance_matrix(csgraph, sources: list, targets: list, max_distance=None, directed=True):
+    unique_sources, source_rows = np.unique(np.asarray(sources, dtype=np.int64), return_inverse=True)
+    targets = np.asarray(targets, dtype=np.int64)
+    limit = np.inf if max_distance is None else max_distance
+
+    distances = np.empty((len(unique_sources), len(targets)), dtype=np.float64)
+    chunk_size = max(CHUNK_DISTANCES // max(csgraph.shape[0], 1), 1)
+    for start in range(0, len(unique_sources), chunk_size):
+        chunk = unique_sources[start:start + chunk_size]
+        chunk_distances = dijkstra(csgraph, directed=directed, indices=chunk, limit=limit)
+        distances[start:start + len(chunk)] = chunk_distances[:, targets]
+
+    return distances[source_rows.reshape(-1)]
+
+
+# Convert a distance matrix into the lists of rows, columns and distances of its finite entries
+def get_sparse_entries(distances):
+    rows, columns = np.nonzero(np.isfinite(distances))
+    return rows.tolist(), columns.tolist(), distances[rows, columns].tolist()
@@ -0,0 +1,47 @@
+import math
+
+import numpy as np
+
+
+# Define the radius of the Earth in kilometers
+EARTH_RADIUS_KM = 6371
+
+
+# Compute the haversine distance in kilometers from many geological points to a single point
+def get_distances(lats, lons, point):
+    lat1, lon1 = np.radians(np.asarray(lats, dtype=np.float64)), np.radians(np.asarray(lons, dtype=np.float64))
+    lat2, lon2 = math.radians(point[0]), math.radians(point[1])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * math.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return EARTH_RADIUS_KM * c
+
+
+# Compute the haversine distance in kilometers between each pair of points of two arrays of
+# [lat, lon] points of the same length
+def get_pair_distances(points_1, points_2):
+    points_1 = np.radians(np.asarray(points_1, dtype=np.float64).reshape(-1, 2))
+    points_2 = np.radians(np.asarray(points_2, dtype=np.float64).reshape(-1, 2))
+
+    dlat = points_2[:, 0] - points_1[:, 0]
+    dlon = points_2[:, 1] - points_1[:, 1]
+
+    a = np.sin(dlat/2)**2 + np.cos(points_1[:, 0]) * np.cos(points_2[:, 0]) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return EARTH_RADIUS_KM * c
+
+
+# Get the distance in kilometers between each pair of consecutive points of a list of [lat, lon] points
+def get_segment_distances(points: list):
+    points = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    lats, lons = points[:, 0], points[:, 1]
+
+    dlat = np.diff(lats)
+    dlon = np.diff(lons)
+
+    a = np.sin(dlat/2)**2 + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(dlon/2)**2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return EARTH_RADIUS_KM * c
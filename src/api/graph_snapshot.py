@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+# Version of the snapshot layout, bump this whenever the arrays written by build_snapshot change
+SNAPSHOT_VERSION = 2
+
+# Arrays that make up a snapshot, each one is stored as its own .npy file so it can be memory-mapped
+ARRAY_NAMES = (
+    "node_ids", "coords", "lat", "lon",
+    "indptr", "indices", "lengths",
+    "rev_indptr", "rev_indices", "rev_lengths",
+)
+
+
+# Compact, array-backed copy of a street graph
+# Nodes are numbered 0..n-1 in the order of their OpenStreetMap ids, and the outgoing edges of every node
+# are stored in CSR form: the neighbors of node i are indices[indptr[i]:indptr[i + 1]]
+# The incoming edges are stored the same way in the rev_ arrays for searches that run backwards
+class GraphSnapshot():
+    def __init__(self, arrays: dict, path=None):
+        self.path = path
+
+        # OpenStreetMap ids of the nodes, sorted so that they can be looked up with a binary search
+        self.node_ids = arrays["node_ids"]
+
+        # Exact [lat, lon] of each node, kept in double precision so the coordinates returned to the clients
+        # stay identical to the ones of the routes that were already contributed
+        self.coords = arrays["coords"]
+
+        # Single precision copies of the coordinates used for computations
+        self.lat = arrays["lat"]
+        self.lon = arrays["lon"]
+
+        # Adjacency of the graph along with the length of each edge in meters
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.lengths = arrays["lengths"]
+
+        # Adjacency of the reversed graph
+        self.rev_indptr = arrays["rev_indptr"]
+        self.rev_indices = arrays["rev_indices"]
+        self.rev_lengths = arrays["rev_lengths"]
+
+
+    # Load a snapshot from a directory written by build_snapshot
+    # The arrays are memory-mapped, so they are only read from the disk once they are used and the pages
+    # are shared by every process that loads the same snapshot
+    @classmethod
+    def load(cls, path: str):
+        meta = load_meta(path)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Graph snapshot at {path} is outdated, rebuild it with graph_snapshot.py")
+
+        return cls(load_arrays(path, ARRAY_NAMES), path)
+
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+
+    # Total size of the arrays in bytes
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_NAMES)
+
+
+    # Convert an OpenStreetMap node id to the index of the node in the snapshot
+    def node_index(self, node_id: int):
+        index = int(np.searchsorted(self.node_ids, node_id))
+        if index == len(self.node_ids) or self.node_ids[index] != node_id:
+            raise KeyError(node_id)
+
+        return index
+
+
+    # Get the outgoing edges of a node as lists of neighbors and edge lengths
+    def neighbors(self, node: int):
+        start = self.indptr[node]
+        end = self.indptr[node + 1]
+        return self.indices[start:end].tolist(), self.lengths[start:end].tolist()
+
+
+    # Get the incoming edges of a node as lists of neighbors and edge lengths
+    def reverse_neighbors(self, node: int):
+        start = self.rev_indptr[node]
+        end = self.rev_indptr[node + 1]
+        return self.rev_indices[start:end].tolist(), self.rev_lengths[start:end].tolist()
+
+
+    # Convert a list of nodes into geological coordinates
+    def get_coords(self, nodes: list):
+        return self.coords[np.asarray(nodes, dtype=np.int64)].tolist()
+
+
+    # Find the node closest to a geological point by comparing it against every node
+    def nearest_node(self, lat: float, lon: float):
+        # Equirectangular approximation, which is accurate enough for the size of a city
+        dx = (self.lon - np.float32(lon)) * np.float32(np.cos(np.radians(lat)))
+        dy = self.lat - np.float32(lat)
+        return int(np.argmin(dx * dx + dy * dy))
+
+
+# Write a set of arrays as .npy files along with a meta.json file describing them
+def save_arrays(path: str, arrays: dict, meta: dict):
+    # Write everything to a temporary directory first so that a running server never sees half-written files
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_path, f"{name}.npy"), array)
+
+    with open(os.path.join(temp_path, "meta.json"), "w") as file:
+        json.dump(meta, file)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(temp_path, path)
+
+
+# Read the meta.json file of a directory written by save_arrays
+def load_meta(path: str):
+    with open(os.path.join(path, "meta.json")) as file:
+        return json.load(file)
+
+
+# Memory-map the arrays of a directory written by save_arrays
+# The memory maps are viewed as plain arrays since slicing np.memmap objects is much slower
+def load_arrays(path: str, names: tuple):
+    return {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")) for name in names}
+
+
+# Lay out a list of edges in CSR form by sorting them by their source node
+# Any extra arrays of edge data, such as the lengths, are returned in the same order as the targets
+def build_csr(sources, targets, node_count: int, *columns):
+    order = np.lexsort((targets, sources))
+
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+
+    return (indptr, targets[order].astype(np.int32), *(column[order] for column in columns))
+
+
+# Get the arrays of a snapshot from its nodes and a list of edges given as arrays of node indices and lengths
+def get_snapshot_arrays(node_ids, coords, sources, targets, lengths):
+    node_count = len(node_ids)
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.float32)
+
+    # Only keep the shortest of parallel edges, which is the one nx.shortest_path would use with weight="length"
+    # Self loops are dropped since they are never part of a shortest path
+    keep = sources != targets
+    sources, targets, lengths = sources[keep], targets[keep], lengths[keep]
+
+    order = np.lexsort((lengths, targets, sources))
+    sources, targets, lengths = sources[order], targets[order], lengths[order]
+
+    first = np.ones(len(sources), dtype=bool)
+    first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+    sources, targets, lengths = sources[first], targets[first], lengths[first]
+
+    indptr, indices, edge_lengths = build_csr(sources, targets, node_count, lengths)
+    rev_indptr, rev_indices, rev_lengths = build_csr(targets, sources, node_count, lengths)
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(node_count, 2)
+
+    return {
+        "node_ids": np.asarray(node_ids, dtype=np.int64),
+        "coords": coords,
+        "lat": coords[:, 0].astype(np.float32),
+        "lon": coords[:, 1].astype(np.float32),
+        "indptr": indptr,
+        "indices": indices,
+        "lengths": edge_lengths,
+        "rev_indptr": rev_indptr,
+        "rev_indices": rev_indices,
+        "rev_lengths": rev_lengths,
+    }
+
+
+# Get every edge of a snapshot as arrays of source nodes, target nodes and lengths
+def get_edges(graph):
+    sources = np.repeat(np.arange(graph.node_count, dtype=np.int64), np.diff(graph.indptr))
+    return sources, np.asarray(graph.indices, dtype=np.int64), np.asarray(graph.lengths)
+
+
+# Write a snapshot to a directory
+def save_snapshot(graph, path: str, source=None):
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "source": source,
+        "nodes": graph.node_count,
+        "edges": graph.edge_count,
+    }
+
+    save_arrays(path, {name: getattr(graph, name) for name in ARRAY_NAMES}, meta)
+    return GraphSnapshot.load(path)
+
+
+# Build a snapshot from a networkx graph loaded from a GraphML file and write it to a directory
+def build_snapshot(graph, path: str, source=None):
+    node_ids = sorted(graph.nodes)
+    position = {node_id: i for i, node_id in enumerate(node_ids)}
+
+    coords = [[graph.nodes[node_id]["y"], graph.nodes[node_id]["x"]] for node_id in node_ids]
+
+    sources = []
+    targets = []
+    lengths = []
+    for u, v, length in graph.edges(data="length"):
+        sources.append(position[u])
+        targets.append(position[v])
+        lengths.append(float(length))
+
+    snapshot = GraphSnapshot(get_snapshot_arrays(node_ids, coords, sources, targets, lengths))
+    return save_snapshot(snapshot, path, source)
+
+
+# Combine several snapshots into a single snapshot kept in memory, joined at the nodes they share
+def merge_snapshots(graphs: list):
+    node_ids, first = np.unique(np.concatenate([graph.node_ids for graph in graphs]), return_index=True)
+    coords = np.concatenate([graph.coords for graph in graphs])[first]
+
+    sources = []
+    targets = []
+    lengths = []
+    for graph in graphs:
+        # Convert the nodes of each snapshot to the nodes of the combined snapshot
+        positions = np.searchsorted(node_ids, graph.node_ids)
+        graph_sources, graph_targets, graph_lengths = get_edges(graph)
+        sources.append(positions[graph_sources])
+        targets.append(positions[graph_targets])
+        lengths.append(graph_lengths)
+
+    return GraphSnapshot(get_snapshot_arrays(node_ids, coords, np.concatenate(sources), np.concatenate(targets), np.concatenate(lengths)))
+
+
+# Get the part of a snapshot made of the selected nodes and the edges between them, kept in memory
+def subset_snapshot(graph, selected):
+    selected = np.asarray(selected, dtype=bool)
+    positions = np.cumsum(selected) - 1
+
+    sources, targets, lengths = get_edges(graph)
+    keep = selected[sources] & selected[targets]
+
+    return GraphSnapshot(get_snapshot_arrays(
+        np.asarray(graph.node_ids)[selected],
+        np.asarray(graph.coords)[selected],
+        positions[sources[keep]],
+        positions[targets[keep]],
+        lengths[keep],
+    ))
+
+
+# Get the default location of the snapshot of a GraphML file, which is right next to it
+def get_snapshot_path(graphml_path: str):
+    return os.path.splitext(graphml_path)[0] + ".snapshot"
+
+
+# Build the snapshot of a GraphML file
+def build_snapshot_from_graphml(graphml_path: str, path=None):
+    # Only needed for the build step, so the server can start without parsing GraphML at all
+    import osmnx as ox
+
+    graph = ox.load_graphml(graphml_path)
+    return build_snapshot(graph, path or get_snapshot_path(graphml_path), source=os.path.basename(graphml_path))
+
+
+# Check if a snapshot exists and was written with the current layout
+def is_snapshot_current(path: str):
+    try:
+        return load_meta(path).get("version") == SNAPSHOT_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+# Load the snapshot of a GraphML file, building it first if it does not exist yet or is outdated
+def load_snapshot(graphml_path: str):
+    path = get_snapshot_path(graphml_path)
+    if not is_snapshot_current(path):
+        print(f"Building graph snapshot from {graphml_path}...")
+        return build_snapshot_from_graphml(graphml_path, path)
+
+    return GraphSnapshot.load(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a compact graph snapshot from a GraphML file.")
+    parser.add_argument("graphml", help="Path to the GraphML file of the street graph.")
+    parser.add_argument("-o", "--output", default=None, help="Directory to write the snapshot to.")
+    args = parser.parse_args()
+
+    snapshot = build_snapshot_from_graphml(args.graphml, args.output)
+    print(f"Wrote {snapshot.node_count} nodes and {snapshot.edge_count} edges ({snapshot.nbytes / 2**20:.1f} MiB) to {snapshot.path}")
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from contraction_hierarchy import build_hierarchy, get_hierarchy_path, load_hierarchy, save_hierarchy
+from graph_snapshot import GraphSnapshot, get_snapshot_path, load_arrays, load_snapshot, merge_snapshots, save_snapshot, subset_snapshot
+from lru_cache import LRUCache
+from street_network import PATH_CACHE_SIZE, StreetNetwork
+
+
+# Version of the tile index layout, bump this whenever the index written by build_tiles changes
+TILES_VERSION = 1
+
+# Name of the file listing the tiles in a tiles directory
+TILE_INDEX = "index.json"
+
+# Margin in degrees (about 1 km) around each tile and around each request
+# Tiles include the streets within the margin of their bounds so that neighboring tiles overlap and
+# can be joined, and requests load every tile within the margin of their points so that paths can
+# leave the bounding box of the points a little
+TILE_MARGIN = 0.01
+
+# Default memory limit of the loaded street networks in bytes
+MEMORY_LIMIT = 512 * 2**20
+
+
+# Get the bounding box of a list of [lat, lon] points as [min_lat, min_lon, max_lat, max_lon]
+def get_bounds(points: list):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return [*points.min(axis=0).tolist(), *points.max(axis=0).tolist()]
+
+
+# Check if two bounding boxes overlap
+def intersects(bounds_a: list, bounds_b: list):
+    return bounds_a[0] <= bounds_b[2] and bounds_b[0] <= bounds_a[2] and bounds_a[1] <= bounds_b[3] and bounds_b[1] <= bounds_a[3]
+
+
+# Loads the street graph tiles needed by each request on demand
+# Tiles that were not used recently are dropped once the loaded networks go over the memory limit, and
+# requests that span several tiles are answered on a network made by joining those tiles at their shared nodes
+class TileManager():
+    def __init__(self, tiles: list, memory_limit=MEMORY_LIMIT, path_cache_size=PATH_CACHE_SIZE, margin=TILE_MARGIN):
+        # Each tile has a name, the bounds it covers (None if it covers everything), and the paths of its
+        # snapshot and contraction hierarchy
+        self.tiles = tiles
+        self.margin = margin
+        self.path_cache_size = path_cache_size
+
+        # Loaded networks keyed by the names of the tiles they were made of
+        self.networks = LRUCache(memory_limit, get_size=lambda network: network.nbytes)
+
+        # Memory-mapped node ids and coordinates of each tile, used to look nodes up without loading the networks
+        self.node_tables = {}
+
+
+    # Load the tiles listed in the index of a tiles directory written by build_tiles
+    @classmethod
+    def load(cls, directory: str, memory_limit=MEMORY_LIMIT, path_cache_size=PATH_CACHE_SIZE):
+        with open(os.path.join(directory, TILE_INDEX)) as file:
+            index = json.load(file)
+
+        if index.get("version") != TILES_VERSION:
+            raise ValueError(f"Tile index at {directory} is outdated, rebuild it with graph_tiles.py")
+
+        tiles = []
+        for tile in index["tiles"]:
+            tile = dict(tile)
+            tile["snapshot"] = os.path.join(directory, tile["snapshot"])
+            if tile.get("hierarchy") is not None:
+                tile["hierarchy"] = os.path.join(directory, tile["hierarchy"])
+            tiles.append(tile)
+
+        return cls(tiles, memory_limit, path_cache_size, index.get("margin", TILE_MARGIN))
+
+
+    # Serve a single GraphML file as one tile that covers everything
+    @classmethod
+    def from_graphml(cls, graphml_path: str, memory_limit=MEMORY_LIMIT, path_cache_size=PATH_CACHE_SIZE):
+        # Build the snapshot right away if needed instead of during the first request
+        load_snapshot(graphml_path)
+
+        tile = {
+            "name": os.path.basename(graphml_path),
+            "bounds": None,
+            "snapshot": get_snapshot_path(graphml_path),
+            "hierarchy": get_hierarchy_path(graphml_path),
+        }
+        return cls([tile], memory_limit, path_cache_size)
+
+
+    # Check if a directory contains tiles written by build_tiles
+    @staticmethod
+    def has_tiles(directory: str):
+        return os.path.exists(os.path.join(directory, TILE_INDEX))
+
+
+    # Get the tiles within the margin of a bounding box
+    def find_tiles(self, bounds: list):
+        bounds = [bounds[0] - self.margin, bounds[1] - self.margin, bounds[2] + self.margin, bounds[3] + self.margin]
+        return [tile for tile in self.tiles if tile["bounds"] is None or intersects(tile["bounds"], bounds)]
+
+
+    # Load the network of a single tile
+    def load_tile(self, tile: dict):
+        graph = GraphSnapshot.load(tile["snapshot"])
+        hierarchy = load_hierarchy(tile["hierarchy"], graph) if tile.get("hierarchy") is not None else None
+        return StreetNetwork(graph, hierarchy, self.path_cache_size, tile["name"], [tile["name"]])
+
+
+    # Get the network that covers a list of [lat, lon] points, loading the tiles it needs if they are not loaded yet
+    def get_network(self, points: list):
+        tiles = self.find_tiles(get_bounds(points))
+        if len(tiles) == 0:
+            raise KeyError("There is no street graph that covers the given points")
+
+        return self.get_tiles_network([tile["name"] for tile in tiles])
+
+
+    # Get the network made of the tiles with the given names, loading them if they are not loaded yet
+    # The same names always give the same graph, so node ids can be shared between processes
+    def get_tiles_network(self, tile_names: list):
+        key = tuple(sorted(tile_names))
+        network = self.networks.get(key)
+        if network is not None:
+            return network
+
+        tiles = [tile for tile in self.tiles if tile["name"] in key]
+        if len(tiles) != len(key):
+            raise KeyError(f"Unknown street graph tiles {', '.join(key)}")
+
+        print(f"Loading street graph tiles {', '.join(key)}...")
+        if len(tiles) == 1:
+            network = self.load_tile(tiles[0])
+        else:
+            # Contraction hierarchies only cover their own tile, so paths on joined tiles are found with A*
+            graph = merge_snapshots([GraphSnapshot.load(tile["snapshot"]) for tile in sorted(tiles, key=lambda tile: tile["name"])])
+            network = StreetNetwork(graph, None, self.path_cache_size, "+".join(key), key)
+
+        # Networks grow as paths are cached and indexes are built, so they are measured again whenever they do
+        network.on_resize = lambda: self.networks.resize(key)
+        self.networks.put(key, network)
+        return network
+
+
+    # Get the [lat, lon] of each node from its OpenStreetMap id, which are the same in every tile
+    # Only the node ids and coordinates of the tiles are read, so no network has to be loaded
+    def get_node_coords(self, node_ids: list):
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        coords = np.empty((len(node_ids), 2), dtype=np.float64)
+
+        missing = np.arange(len(node_ids))
+        for tile in self.tiles:
+            if len(missing) == 0:
+                break
+
+            table = self.node_tables.get(tile["name"])
+            if table is None:
+                table = load_arrays(tile["snapshot"], ("node_ids", "coords"))
+                self.node_tables[tile["name"]] = table
+
+            if len(table["node_ids"]) == 0:
+                continue
+
+            # Node ids of the snapshots are sorted, so they are found with a binary search
+            positions = np.minimum(np.searchsorted(table["node_ids"], node_ids[missing]), len(table["node_ids"]) - 1)
+            found = table["node_ids"][positions] == node_ids[missing]
+            coords[missing[found]] = table["coords"][positions[found]]
+            missing = missing[~found]
+
+        if len(missing) > 0:
+            raise KeyError(f"Node {node_ids[missing[0]]} is not in any street graph tile")
+
+        return coords.tolist()
+
+
+    # Convert the coordinates of a route into the ids of the nodes it passes through
+    # Each coordinate becomes its nearest node, and nodes repeated one after another are only kept once
+    def find_route_nodes(self, points: list):
+        node_ids = self.get_network(points).get_node_ids(points)
+        return [node_id for index, node_id in enumerate(node_ids) if index == 0 or node_id != node_ids[index - 1]]
+
+
+    # Get the counters of the loaded networks and their path caches
+    def get_stats(self):
+        networks = self.networks.values()
+
+        path_cache = {"entries": 0, "size": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for network in networks:
+            for counter, value in network.path_cache.get_stats().items():
+                if counter in path_cache:
+                    path_cache[counter] += value
+
+        return {
+            "tiles": len(self.tiles),
+            "loaded": [network.name for network in networks],
+            "networks": self.networks.get_stats(),
+            "path_cache": path_cache,
+        }
+
+
+# Split street graphs into tiles and write them to a directory along with their index
+# With a tile size, the graphs are joined and cut into a grid of square tiles of that size in degrees,
+# otherwise each graph becomes its own tile, such as one tile per city
+def build_tiles(graphml_paths: list, directory: str, tile_size=None, margin=TILE_MARGIN, hierarchies=False):
+    os.makedirs(directory, exist_ok=True)
+    graphs = [(os.path.splitext(os.path.basename(path))[0], load_snapshot(path)) for path in graphml_paths]
+
+    parts = []
+    if tile_size is None:
+        for name, graph in graphs:
+            parts.append((name, get_bounds(graph.coords), graph))
+    else:
+        graph = merge_snapshots([graph for _, graph in graphs]) if len(graphs) > 1 else graphs[0][1]
+        lat = np.asarray(graph.coords[:, 0])
+        lon = np.asarray(graph.coords[:, 1])
+
+        # Only create tiles for the cells of the grid that contain nodes
+        cells = set(zip(np.floor(lat / tile_size).astype(int).tolist(), np.floor(lon / tile_size).astype(int).tolist()))
+        for row, column in sorted(cells):
+            bounds = [row * tile_size, column * tile_size, (row + 1) * tile_size, (column + 1) * tile_size]
+            selected = (
+                (lat >= bounds[0] - margin) & (lat <= bounds[2] + margin) &
+                (lon >= bounds[1] - margin) & (lon <= bounds[3] + margin)
+            )
+            parts.append((f"tile_{row}_{column}", bounds, subset_snapshot(graph, selected)))
+
+    tiles = []
+    for name, bounds, graph in parts:
+        snapshot_name = f"{name}.snapshot"
+        graph = save_snapshot(graph, os.path.join(directory, snapshot_name), name)
+
+        hierarchy_name = None
+        if hierarchies:
+            hierarchy_name = f"{name}.ch"
+            start = time.perf_counter()
+            hierarchy = build_hierarchy(graph)
+            save_hierarchy(hierarchy, graph, os.path.join(directory, hierarchy_name), time.perf_counter() - start)
+
+        tiles.append({
+            "name": name,
+            "bounds": bounds,
+            "snapshot": snapshot_name,
+            "hierarchy": hierarchy_name,
+            "nodes": graph.node_count,
+            "nbytes": graph.nbytes,
+        })
+        print(f"Wrote tile {name} with {graph.node_count} nodes")
+
+    index = {
+        "version": TILES_VERSION,
+        "margin": margin,
+        "tiles": tiles,
+    }
+
+    with open(os.path.join(directory, TILE_INDEX), "w") as file:
+        json.dump(index, file, indent=4)
+
+    return tiles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split street graphs into tiles that the API loads on demand.")
+    parser.add_argument("graphml", nargs="+", help="Paths to the GraphML files of the street graphs.")
+    parser.add_argument("-o", "--output", default="tiles", help="Directory to write the tiles to.")
+    parser.add_argument("--tile-size", type=float, default=None, help="Size of the tiles in degrees, each graph becomes one tile if not given.")
+    parser.add_argument("--margin", type=float, default=TILE_MARGIN, help="Overlap between neighboring tiles in degrees.")
+    parser.add_argument("--hierarchy", action="store_true", help="Also build the contraction hierarchy of each tile.")
+    args = parser.parse_args()
+
+    if args.tile_size is not None and args.tile_size <= 0:
+        parser.error("The tile size must be positive")
+
+    tiles = build_tiles(args.graphml, args.output, args.tile_size, args.margin, args.hierarchy)
+    print(f"Wrote {len(tiles)} tiles to {args.output}")
@@ -0,0 +1,63 @@
+# Centered interval tree over closed intervals [start, end], each one with a value
+# Each node keeps the intervals that contain its center sorted by their start and by their end, along with the
+# nodes of the intervals entirely before and after its center, so finding the intervals that contain a point
+# takes O(log n + k) for k intervals found
+class IntervalIndex():
+    # Intervals are (start, end, value) tuples, and intervals that end before they start are left out
+    def __init__(self, intervals: list):
+        # Nodes are stored as (center, by_start, by_end, left, right), where by_start and by_end are lists of
+        # (start, end, value) and left and right are the positions of the child nodes or None
+        self.nodes = []
+        self.root = self.build([interval for interval in intervals if interval[0] <= interval[1]])
+
+
+    def __len__(self):
+        return sum(len(node[1]) for node in self.nodes)
+
+
+    # Build the node of a list of intervals and return its position
+    def build(self, intervals: list):
+        if len(intervals) == 0:
+            return None
+
+        # The median of the endpoints splits the intervals about evenly, which keeps the tree balanced
+        endpoints = sorted(endpoint for start, end, _ in intervals for endpoint in (start, end))
+        center = endpoints[len(endpoints) // 2]
+
+        left = [interval for interval in intervals if interval[1] < center]
+        right = [interval for interval in intervals if interval[0] > center]
+        middle = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+
+        position = len(self.nodes)
+        self.nodes.append(None)
+        by_start = sorted(middle, key=lambda interval: interval[0])
+        by_end = sorted(middle, key=lambda interval: interval[1], reverse=True)
+        self.nodes[position] = (center, by_start, by_end, self.build(left), self.build(right))
+        return position
+
+
+    # Get the values of every interval that contains a point
+    def find(self, point):
+        values = []
+        position = self.root
+        while position is not None:
+            center, by_start, by_end, left, right = self.nodes[position]
+            if point < center:
+                # Every interval here ends after the point, so only the ones that start before it contain it
+                for interval in by_start:
+                    if interval[0] > point:
+                        break
+                    values.append(interval[2])
+                position = left
+            elif point > center:
+                # Every interval here starts before the point, so only the ones that end after it contain it
+                for interval in by_end:
+                    if interval[1] < point:
+                        break
+                    values.append(interval[2])
+                position = right
+            else:
+                values.extend(interval[2] for interval in by_start)
+                position = None
+
+        return values
@@ -0,0 +1,171 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from spatial_index import project, unproject
+
+
+# Average walking speed in meters per second
+WALKING_SPEED = 1.2
+
+# Average speed of jeepneys in city traffic in meters per second, about 15 km/h
+RIDING_SPEED = 4.2
+
+# Average time in seconds spent waiting for a jeepney every time riders board one
+BOARDING_TIME = 300
+
+# Default size in meters of the square cells of the grid of reachable areas
+CELL_SIZE = 200
+
+# Travel time of getting off a route, which is not 0 since scipy leaves out edges with a weight of 0
+ALIGHTING_TIME = 1e-6
+
+
+# Get the graph of the isochrone search as a sparse matrix of travel times in seconds
+# The first nodes are the nodes of the street graph, which are walked in both directions, followed by a node for
+# every position of every transit route, which are ridden from each position to the next one
+# Riders board a route at a position from the street node there after waiting for the boarding time, and get off
+# at any later position, so a single search gives the fastest way to every node with any number of transfers
+# Positions of routes at nodes outside of the street graph can be ridden through but not boarded or got off at
+def get_isochrone_csgraph(network, transit_index, walking_speed=WALKING_SPEED, riding_speed=RIDING_SPEED, boarding_time=BOARDING_TIME):
+    graph = network.graph
+    node_count = graph.node_count
+
+    # Streets are walked both ways, keeping the shortest edge between each pair of nodes
+    walking = network.get_csgraph().tocoo()
+    sources = [walking.row, walking.col]
+    targets = [walking.col, walking.row]
+    times = [walking.data / walking_speed, walking.data / walking_speed]
+
+    node_ids = np.asarray(graph.node_ids)
+    first_position = node_count
+    for route, keys in enumerate(transit_index.keys):
+        if len(keys) == 0:
+            continue
+
+        # Find the street node of each position, if the street graph has it
+        keys = np.asarray(keys, dtype=np.int64)
+        nodes = np.minimum(np.searchsorted(node_ids, keys), max(node_count - 1, 0))
+        found = node_ids[nodes] == keys if node_count > 0 else np.zeros(len(keys), dtype=bool)
+        positions = first_position + np.arange(len(keys))
+
+        # The last position can only be got off at
+        boarding = found.copy()
+        boarding[-1] = False
+
+        offsets = np.asarray(transit_index.get_offsets(route))
+        sources.extend([positions[:-1], nodes[boarding], positions[found]])
+        targets.extend([positions[1:], positions[boarding], nodes[found]])
+        times.extend([
+            np.maximum(np.diff(offsets) / riding_speed, ALIGHTING_TIME),
+            np.full(np.count_nonzero(boarding), float(boarding_time)),
+            np.full(np.count_nonzero(found), ALIGHTING_TIME),
+        ])
+
+        first_position += len(keys)
+
+    sources = np.concatenate(sources).astype(np.int64)
+    targets = np.concatenate(targets).astype(np.int64)
+    times = np.concatenate(times).astype(np.float64)
+
+    # Only the fastest edge between each pair of nodes is kept, since the sparse matrix would add them up
+    order = np.lexsort((times, targets, sources))
+    sources, targets, times = sources[order], targets[order], times[order]
+    first = np.ones(len(sources), dtype=bool)
+    first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+
+    return csr_matrix((times[first], (sources[first], targets[first])), shape=(first_position, first_position))
+
+
+# Get the fastest travel time in seconds from the nearest of the source street nodes to every street node with
+# walking and riding the transit routes, which is infinite for nodes that cannot be reached within max_seconds
+def get_arrival_times(isochrone_csgraph, sources: list, node_count: int, max_seconds: float):
+    times = dijkstra(isochrone_csgraph, indices=np.unique(np.asarray(sources, dtype=np.int64)), min_only=True, limit=max_seconds)
+    return times[:node_count]
+
+
+# Group the street nodes that are reached within max_seconds into square cells of cell_size meters
+# Returns the reference latitude of the projection and the fastest travel time to each cell, keyed by the column
+# and the row of the cell
+def get_grid_cells(graph, times, max_seconds: float, cell_size=CELL_SIZE):
+    reached = np.nonzero(times <= max_seconds)[0]
+    reference_lat = float(np.mean(graph.lat)) if graph.node_count > 0 else 0.0
+    if len(reached) == 0:
+        return reference_lat, {}
+
+    xy = project(np.asarray(graph.lat)[reached], np.asarray(graph.lon)[reached], reference_lat)
+    cells = np.floor(xy / cell_size).astype(np.int64)
+
+    # Keep the fastest time of each cell
+    order = np.lexsort((times[reached], cells[:, 1], cells[:, 0]))
+    cells, cell_times = cells[order], times[reached][order]
+    first = np.ones(len(cells), dtype=bool)
+    first[1:] = np.any(cells[1:] != cells[:-1], axis=1)
+
+    return reference_lat, {(column, row): time for (column, row), time in zip(cells[first].tolist(), cell_times[first].tolist())}
+
+
+# Get the geological coordinates of the centers of cells
+def get_cell_centers(cells: list, reference_lat: float, cell_size=CELL_SIZE):
+    return unproject((np.asarray(cells, dtype=np.float64).reshape(-1, 2) + 0.5) * cell_size, reference_lat).tolist()
+
+
+# Check if the outline of cells changes direction at a corner between the previous and the next corner
+def is_turn(previous: tuple, corner: tuple, following: tuple):
+    return (corner[0] - previous[0], corner[1] - previous[1]) != (following[0] - corner[0], following[1] - corner[1])
+
+
+# Trace the outlines of the areas covered by a set of cells
+# Every side of every cell is a directed edge going counterclockwise around the cell, and the sides shared by two
+# cells cancel out, so the sides left form rings around the areas, counterclockwise around their outside and
+# clockwise around their holes
+# Returns each ring as a list of the corners of the cells, as (column, row), where the ring changes direction
+def get_cell_rings(cells):
+    edges = set()
+    for column, row in cells:
+        corners = [(column, row), (column + 1, row), (column + 1, row + 1), (column, row + 1)]
+        for start, end in zip(corners, corners[1:] + corners[:1]):
+            if (end, start) in edges:
+                edges.remove((end, start))
+            else:
+                edges.add((start, end))
+
+    following = {}
+    for start, end in edges:
+        following.setdefault(start, []).append(end)
+
+    rings = []
+    while following:
+        start = next(iter(following))
+        ring = [start]
+        corner = start
+        while True:
+            ends = following[corner]
+            end = ends.pop()
+            if len(ends) == 0:
+                del following[corner]
+
+            if end == start:
+                break
+
+            ring.append(end)
+            corner = end
+
+        # Only the corners where the ring turns are needed
+        rings.append([
+            corner for index, corner in enumerate(ring)
+            if is_turn(ring[index - 1], corner, ring[(index + 1) % len(ring)])
+        ])
+
+    return rings
+
+
+# Get the outlines of the areas covered by cells as rings of geological coordinates, see get_cell_rings
+# Each ring is closed, which means that it ends with its first point like in GeoJSON
+def get_cell_polygons(cells, reference_lat: float, cell_size=CELL_SIZE):
+    polygons = []
+    for ring in get_cell_rings(cells):
+        coords = unproject(np.asarray(ring + ring[:1], dtype=np.float64) * cell_size, reference_lat)
+        polygons.append(coords.tolist())
+
+    return polygons
@@ -0,0 +1,130 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+from graph_tiles import TileManager
+from street_routing import NoPathError
+
+
+# Default number of legs to compute below which a route is computed serially, since sending the legs to
+# other processes takes longer than just computing a few of them
+PARALLEL_THRESHOLD = 8
+
+# Tile manager of each worker process, created when the process starts
+worker_tiles = None
+
+
+# Create the tile manager of a worker process from the same tiles as the server
+def init_worker(tiles: list, memory_limit: int, path_cache_size: int, margin: float):
+    global worker_tiles
+    worker_tiles = TileManager(tiles, memory_limit, path_cache_size, margin)
+
+
+# Find the shortest path of each leg on a network, which is None for legs without a path if skip_errors is set
+def find_paths(network, legs: list, skip_errors=False):
+    paths = []
+    for source, target in legs:
+        try:
+            paths.append(network.shortest_path(source, target))
+        except NoPathError:
+            if not skip_errors:
+                raise
+            paths.append(None)
+
+    return paths
+
+
+# Find the shortest path of each leg in a worker process on the network made of the given tiles
+def find_leg_paths(tile_names: tuple, legs: list, skip_errors=False):
+    network = worker_tiles.get_tiles_network(tile_names)
+    return find_paths(network, legs, skip_errors)
+
+
+# Split a list into at most count contiguous chunks of about the same size, which is no chunks for an empty list
+def split_chunks(items: list, count: int):
+    if len(items) == 0:
+        return []
+
+    size = -(-len(items) // count)
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+# Computes the legs of long routes on a pool of worker processes
+# Workers load the same tiles as the server, and since snapshots and hierarchies are memory-mapped files,
+# every process reads the same pages of the read-only graph from the page cache instead of its own copy
+class LegPool():
+    def __init__(self, street_tiles: TileManager, processes=None, threshold=PARALLEL_THRESHOLD):
+        self.street_tiles = street_tiles
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.threshold = threshold
+
+        # The pool is only started by the first route long enough to need it
+        self.executor = None
+
+
+    # Get the pool of worker processes, starting it if needed
+    def get_executor(self):
+        if self.executor is None:
+            # The server already runs threads by the time the pool starts, which a forked process could inherit
+            # holding locks, so workers are forked from a separate server process that has no threads instead, or
+            # spawned where that is not available, and load the tiles from their paths either way
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=init_worker,
+                initargs=(
+                    self.street_tiles.tiles,
+                    self.street_tiles.networks.max_size,
+                    self.street_tiles.path_cache_size,
+                    self.street_tiles.margin,
+                ),
+            )
+
+        return self.executor
+
+
+    # Get the shortest path of each leg between consecutive nodes in the order of the legs
+    # Each path starts with the last node of the previous one, or is just that node if both ends are the same
+    def get_leg_paths(self, network, nodes: list):
+        return self.get_paths(network, list(zip(nodes, nodes[1:])))
+
+
+    # Get the shortest path of each (source, target) leg in the order of the legs
+    # Legs without a path raise NoPathError, or get None as their path if skip_errors is set
+    def get_paths(self, network, legs: list, skip_errors=False):
+        paths = [network.get_cached_path(source, target) for source, target in legs]
+
+        # Only the legs that are not cached yet are computed
+        missing = [index for index, path in enumerate(paths) if path is None]
+        if len(missing) == 0:
+            return paths
+
+        if self.processes <= 1 or len(missing) < self.threshold:
+            for index, path in zip(missing, find_paths(network, [legs[index] for index in missing], skip_errors)):
+                paths[index] = path
+            return paths
+
+        # Each worker gets a contiguous chunk of legs, and the results come back in the order of the chunks
+        chunks = split_chunks(missing, self.processes)
+        results = self.get_executor().map(
+            find_leg_paths,
+            [network.tile_names] * len(chunks),
+            [[legs[index] for index in chunk] for chunk in chunks],
+            [skip_errors] * len(chunks),
+        )
+
+        for chunk, chunk_paths in zip(chunks, results):
+            for index, path in zip(chunk, chunk_paths):
+                if path is not None:
+                    network.cache_path(*legs[index], path)
+                paths[index] = path
+
+        return paths
+
+
+    # Stop the worker processes
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+import threading
+
+
+# Thread-safe least recently used cache bounded by the total size of its values instead of their count
+# The size of each value is measured by get_size, which counts every value as 1 by default
+class LRUCache():
+    def __init__(self, max_size: int, get_size=None):
+        self.max_size = max_size
+        self.get_size = get_size if get_size is not None else lambda value: 1
+
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    # Get a value from the cache and mark it as the most recently used
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+
+    # Add a value to the cache, evicting the least recently used values until it fits
+    def put(self, key, value):
+        size = self.get_size(value)
+
+        # Values that can never fit are not cached at all instead of flushing the whole cache
+        if size > self.max_size:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+
+            self.entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+
+    # Measure a value again after it grew or shrank, evicting the least recently used values until it fits
+    # Values that were evicted in the meantime are not added back, and values that no longer fit are evicted
+    def resize(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return
+
+            value, old_size = self.entries[key]
+            size = self.get_size(value)
+            self.entries[key] = (value, size)
+            self.size += size - old_size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+
+    # Get every value in the cache, from the least to the most recently used
+    def values(self):
+        with self.lock:
+            return [value for value, _ in self.entries.values()]
+
+
+    # Remove every value from the cache
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+    # Get the counters of the cache
+    def get_stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
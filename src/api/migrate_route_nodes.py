@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+from backfill_connections import backfill_connections, connect_database, load_street_tiles
+from graph_tiles import TileManager
+from transit import WALKING_TRANSFER_RADIUS, pack_nodes
+
+
+# Convert the routes stored as coordinates into the ids of the street graph nodes they pass through
+# The positions of the connections change along with the routes, so every connection is found again afterwards
+# The coordinates of the routes are kept unless drop_coords is set, since they cannot be recovered from the nodes
+def migrate_route_nodes(db, street_tiles: TileManager, drop_coords=False):
+    cursor = db.cursor()
+
+    # Databases made before routes were stored as nodes do not have the column yet
+    cursor.execute("SHOW COLUMNS FROM routes LIKE 'nodes'")
+    if cursor.fetchone() is None:
+        cursor.execute("ALTER TABLE routes ADD COLUMN nodes longblob AFTER coords")
+
+    # Nor the data version that the route catalogs of the API check for new routes
+    cursor.execute("SHOW COLUMNS FROM routes LIKE 'version'")
+    if cursor.fetchone() is None:
+        cursor.execute("ALTER TABLE routes ADD COLUMN version bigint NOT NULL DEFAULT 0")
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS data_version (id int NOT NULL, version bigint NOT NULL DEFAULT 0, PRIMARY KEY (id))")
+    cursor.execute("INSERT IGNORE INTO data_version (id, version) VALUES (1, 0)")
+
+    cursor.execute("SELECT id, coords FROM routes WHERE nodes IS NULL AND coords IS NOT NULL")
+    results = cursor.fetchall()
+
+    migrated = 0
+    for route_id, coords in results:
+        try:
+            nodes = street_tiles.find_route_nodes(json.loads(coords))
+        except KeyError:
+            print(f"Skipped route {route_id}, which is outside of the street graph")
+            continue
+
+        if drop_coords:
+            cursor.execute("UPDATE routes SET nodes=%s, coords=NULL WHERE id=%s", (pack_nodes(nodes), route_id))
+        else:
+            cursor.execute("UPDATE routes SET nodes=%s WHERE id=%s", (pack_nodes(nodes), route_id))
+        migrated += 1
+
+    db.commit()
+    cursor.close()
+    return migrated, len(results)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Convert the routes stored as coordinates into street graph node ids.")
+    parser.add_argument("--tiles", default="tiles", help="Directory of the street graph tiles used by the API.")
+    parser.add_argument("--graphml", default="batangas_city.graphml", help="GraphML file used by the API if there are no tiles.")
+    parser.add_argument("--walking-radius", type=float, default=float(os.getenv("WALKING_TRANSFER_RADIUS", WALKING_TRANSFER_RADIUS)), help="Farthest that riders walk in meters to transfer between routes.")
+    parser.add_argument("--drop-coords", action="store_true", help="Remove the coordinates of the migrated routes, which cannot be undone.")
+    args = parser.parse_args()
+
+    street_tiles = load_street_tiles(args.tiles, args.graphml)
+    db = connect_database()
+    migrated, total = migrate_route_nodes(db, street_tiles, args.drop_coords)
+    print(f"Migrated {migrated} of {total} routes")
+
+    updated, total = backfill_connections(db, street_tiles, walking_radius=args.walking_radius)
+    print(f"Stored the connections of {updated} of {total} routes")
@@ -0,0 +1,89 @@
+import math
+
+import numpy as np
+
+from spatial_index import project
+
+
+# Default number of decimal places kept by encoded polylines, which is about a meter
+POLYLINE_PRECISION = 5
+
+# Size of a pixel in meters at the equator on zoom level 0 of the 256 pixel tiles used by web maps
+METERS_PER_PIXEL = 156543.03392
+
+# Fraction of a pixel that simplified routes may stray from the original route at the requested zoom level
+SIMPLIFY_PIXELS = 0.5
+
+
+# Encode a list of [lat, lon] points with the encoded polyline algorithm
+# Each coordinate is stored as the difference from the previous one in chunks of 5 bits, so a point usually
+# takes a few characters instead of two full numbers
+# The server only encodes polylines, and the app decodes them with decode_polyline in src/app/polyline.py
+def encode_polyline(points: list, precision=POLYLINE_PRECISION):
+    factor = 10 ** precision
+    chunks = []
+
+    previous_lat = 0
+    previous_lon = 0
+    for lat, lon in points:
+        lat = math.floor(lat * factor + 0.5)
+        lon = math.floor(lon * factor + 0.5)
+
+        for delta in (lat - previous_lat, lon - previous_lon):
+            # Move the sign to the lowest bit so that small negative numbers stay small
+            value = ~(delta << 1) if delta < 0 else delta << 1
+
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+
+        previous_lat = lat
+        previous_lon = lon
+
+    return "".join(chunks)
+
+
+# Get the distance in meters that a route may be simplified by when drawn at a zoom level
+def get_zoom_tolerance(zoom: float, lat: float):
+    return SIMPLIFY_PIXELS * METERS_PER_PIXEL * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+# Remove the points of a route that are within a tolerance in meters of the simplified route with the
+# Douglas-Peucker algorithm, always keeping the first and last points
+def simplify(points: list, tolerance: float):
+    if len(points) < 3:
+        return points
+
+    coords = np.asarray(points, dtype=np.float64)
+    xy = project(coords[:, 0], coords[:, 1], float(coords[:, 0].mean()))
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Split the route at its farthest point until every point is close enough to its segment
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        start = xy[first]
+        segment = xy[last] - start
+        offsets = xy[first + 1:last] - start
+
+        # Distance of each point in between to the segment, or to its start if both ends are the same
+        length = segment @ segment
+        if length > 0:
+            t = np.clip(offsets @ segment / length, 0.0, 1.0)
+            offsets = offsets - np.outer(t, segment)
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
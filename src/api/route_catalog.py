@@ -0,0 +1,213 @@
+import json
+import math
+import threading
+
+from interval_index import IntervalIndex
+from lru_cache import LRUCache
+from transit import WALKING_TRANSFER_RADIUS, TransitIndex, unpack_nodes
+
+
+# Number of transit indexes kept for the sets of candidate routes that were requested recently
+INDEX_CACHE_SIZE = 32
+
+# Columns of the routes and of their areas loaded into the catalog
+ROUTE_COLUMNS = ", ".join([
+    "routes.id",
+    "routes.name",
+    "routes.description",
+    "routes.start_time",
+    "routes.end_time",
+    "routes.coords",
+    "routes.connections",
+    "routes.uploader_id",
+    "routes.nodes",
+    "route_areas.region_id",
+    "route_areas.state_id",
+    "route_areas.city_id",
+])
+
+
+# Number of seconds in a day
+DAY_SECONDS = 24 * 3600
+
+
+# Convert a TIME column, which the database driver returns as a timedelta, into seconds since midnight
+def get_seconds(time):
+    return int(time.total_seconds())
+
+
+# Get the intervals of the day in seconds when a route that runs from start to end is running
+# Routes that end before they start run overnight, so their service is split at midnight
+def get_service_intervals(start: int, end: int):
+    if end < start:
+        return [(start, DAY_SECONDS - 1), (0, end)]
+
+    return [(start, end)]
+
+
+# Get the bounding box of a list of [lat, lon] coordinates as (min_lat, min_lon, max_lat, max_lon)
+def get_bounds(coords: list):
+    lats = [coord[0] for coord in coords]
+    lons = [coord[1] for coord in coords]
+    return (min(lats), min(lons), max(lats), max(lons))
+
+
+# In-memory copy of the transport routes with their nodes, coordinates and connections already parsed
+# The routes only change when one is contributed, which bumps the data version in the database, so each request
+# only checks the version and loads the routes that changed since then, which keeps the catalogs of every worker
+# in sync with the database
+# Transit indexes are kept for the sets of candidate routes that were requested recently, so their lazily
+# computed offsets and transfers are shared by the requests until the version changes
+# Walking transfers are found within walking_radius meters for the routes without stored connections, which should
+# be the radius that the stored connections were found with
+class RouteCatalog():
+    def __init__(self, street_tiles, index_cache_size=INDEX_CACHE_SIZE, walking_radius=WALKING_TRANSFER_RADIUS):
+        self.street_tiles = street_tiles
+        self.walking_radius = walking_radius
+        self.version = None
+
+        # Parsed routes, their stored connections, their areas, and their times in seconds keyed by route id
+        self.routes = {}
+        self.connections = {}
+        self.areas = {}
+        self.times = {}
+
+        # Bounding box of the coordinates of each route as (min_lat, min_lon, max_lat, max_lon)
+        self.bounds = {}
+
+        # Interval index of the times when each route is running, built again once the routes change
+        self.service_index = None
+
+        # Transit indexes keyed by the data version and the ids of their routes
+        self.indexes = LRUCache(index_cache_size)
+        self.lock = threading.Lock()
+
+
+    # Load the routes that changed since the last refresh if the data version of the database changed
+    # fetch_all runs a query and returns all of its rows, and end_transaction ends the open transaction of its
+    # connection, since a connection that does not autocommit keeps reading the snapshot of its first read under
+    # REPEATABLE READ and would never see the version bumped by the other workers
+    def refresh(self, fetch_all, end_transaction=None):
+        if end_transaction is not None:
+            end_transaction()
+
+        version = fetch_all("SELECT version FROM data_version WHERE id = 1")[0][0]
+
+        with self.lock:
+            if version == self.version:
+                return
+
+            # Every route is loaded the first time
+            query = f"SELECT {ROUTE_COLUMNS} FROM routes LEFT JOIN route_areas ON route_areas.route_id = routes.id"
+            if self.version is not None:
+                query += f" WHERE routes.version > {int(self.version)}"
+
+            for res in fetch_all(query):
+                self.load_route(res)
+
+            self.version = version
+
+
+    # Parse a row of the routes and add it to the catalog, replacing the previous version of the route
+    def load_route(self, res):
+        route_id = res[0]
+
+        # Get the nodes of the route, converting the coordinates of routes that were not migrated yet, and
+        # get the coordinates from the nodes, leaving out routes on streets that are not in the street graph
+        try:
+            nodes = unpack_nodes(res[8]) if res[8] is not None else self.street_tiles.find_route_nodes(json.loads(res[5]))
+            coords = self.street_tiles.get_node_coords(nodes)
+        except KeyError:
+            self.remove_route(route_id)
+            return
+
+        self.routes[route_id] = {
+            "id": route_id,
+            "name": res[1],
+            "description": res[2],
+            "start_time": str(res[3]),
+            "end_time": str(res[4]),
+            "nodes": nodes,
+            "coords": coords,
+            "uploader_id": res[7],
+        }
+
+        # Routes without stored connections yet have them found from their nodes
+        self.connections[route_id] = json.loads(res[6]) if res[6] else None
+        self.areas[route_id] = {"region_id": res[9], "state_id": res[10], "city_id": res[11]}
+        self.times[route_id] = (get_seconds(res[3]), get_seconds(res[4]))
+        if len(coords) > 0:
+            self.bounds[route_id] = get_bounds(coords)
+        else:
+            self.bounds.pop(route_id, None)
+        self.service_index = None
+
+
+    # Remove a route from the catalog
+    def remove_route(self, route_id):
+        for routes in (self.routes, self.connections, self.areas, self.times, self.bounds):
+            routes.pop(route_id, None)
+
+        self.service_index = None
+
+
+    # Get the ids of the routes in an area that are running at a time in seconds since midnight
+    # Every route is in the area if column is None, otherwise column is one of region_id, state_id and city_id
+    def get_route_ids(self, column, value, seconds: int):
+        if self.service_index is None:
+            self.service_index = IntervalIndex([
+                (start, end, route_id)
+                for route_id, times in self.times.items()
+                for start, end in get_service_intervals(*times)
+            ])
+
+        return sorted(
+            route_id for route_id in self.service_index.find(seconds % DAY_SECONDS)
+            if column is None or self.areas[route_id][column] == value
+        )
+
+
+    # Get the ids of the routes that can meet a route along coordinates or pass within distance meters of it, which
+    # are the routes whose bounding box is within distance meters of the bounding box of the coordinates
+    def get_nearby_route_ids(self, coords: list, distance: float):
+        min_lat, min_lon, max_lat, max_lon = get_bounds(coords)
+        lat_offset = distance / 111_320
+        lon_offset = distance / (111_320 * max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 0.01))
+
+        with self.lock:
+            return sorted(
+                route_id for route_id, bounds in self.bounds.items()
+                if bounds[0] <= max_lat + lat_offset and bounds[2] >= min_lat - lat_offset
+                and bounds[1] <= max_lon + lon_offset and bounds[3] >= min_lon - lon_offset
+            )
+
+
+    # Get the key of the transit index of the routes in an area that are running at a time in seconds since
+    # midnight, which is the data version and the ids of the routes, so it is the same for every time of the day
+    # that the same routes are running and changes whenever a route is contributed
+    def get_index_key(self, column, value, seconds: int):
+        with self.lock:
+            return (self.version, tuple(self.get_route_ids(column, value, seconds)))
+
+
+    # Get the transit index of the routes in an area that are running at a time in seconds since midnight
+    def get_transit_index(self, column, value, seconds: int):
+        with self.lock:
+            key = (self.version, tuple(self.get_route_ids(column, value, seconds)))
+            transit_index = self.indexes.get(key)
+            if transit_index is None:
+                routes = [self.routes[route_id] for route_id in key[1]]
+                connections = [self.connections[route_id] for route_id in key[1]]
+                transit_index = TransitIndex(routes, connections, self.walking_radius)
+                self.indexes.put(key, transit_index)
+
+        return transit_index
+
+
+    # Get the counters of the catalog and of its transit indexes
+    def get_stats(self):
+        return {
+            "version": self.version,
+            "routes": len(self.routes),
+            "indexes": self.indexes.get_stats(),
+        }
@@ -0,0 +1,153 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+# Mean radius of the Earth in meters
+EARTH_RADIUS = 6371009
+
+
+# Project geological coordinates to planar coordinates in meters around a reference latitude
+# The equirectangular projection is accurate to a fraction of a meter at the scale of a city
+def project(lat, lon, reference_lat: float):
+    scale = np.radians(1.0) * EARTH_RADIUS
+    x = np.asarray(lon, dtype=np.float64) * scale * np.cos(np.radians(reference_lat))
+    y = np.asarray(lat, dtype=np.float64) * scale
+    return np.column_stack((x, y))
+
+
+# Convert planar coordinates in meters back into geological coordinates, the reverse of project
+def unproject(xy, reference_lat: float):
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    scale = np.radians(1.0) * EARTH_RADIUS
+    lon = xy[:, 0] / (scale * np.cos(np.radians(reference_lat)))
+    lat = xy[:, 1] / scale
+    return np.column_stack((lat, lon))
+
+
+# Spatial index over the nodes of a graph snapshot, built once on startup and shared by every request
+class NodeIndex():
+    def __init__(self, graph):
+        self.graph = graph
+        self.reference_lat = float(np.mean(graph.lat)) if graph.node_count > 0 else 0.0
+        self.tree = cKDTree(project(graph.lat, graph.lon, self.reference_lat))
+
+
+    # Project a list of [lat, lon] points to the planar coordinates of the index
+    def project_points(self, points: list):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return project(points[:, 0], points[:, 1], self.reference_lat)
+
+
+    # Get the nearest node of each point in a single vectorized query
+    def nearest(self, points: list):
+        _, nodes = self.tree.query(self.project_points(points))
+        return nodes.tolist()
+
+
+    # Get the k nearest nodes of each point along with their distances in meters, sorted from nearest
+    def k_nearest(self, points: list, k: int):
+        k = min(k, self.graph.node_count)
+        distances, nodes = self.tree.query(self.project_points(points), k=k)
+        return distances.reshape(-1, k), nodes.reshape(-1, k)
+
+
+    # Get the nodes within a radius in meters of each point
+    def within_radius(self, points: list, radius: float):
+        return [list(nodes) for nodes in self.tree.query_ball_point(self.project_points(points), r=radius)]
+
+
+# Longest piece that the edges are split into for the edge index, in meters
+EDGE_PIECE_LENGTH = 50
+
+# Number of nearest pieces of edges checked first when snapping a point to an edge
+EDGE_CANDIDATES = 8
+
+
+# Projection of a geological point on an edge of the street graph
+# The projected point is on the straight segment between the two nodes of the edge, at fraction of its length
+# from the first node, and distance is how far the original point is from it in meters
+class EdgeProjection():
+    def __init__(self, first: int, second: int, fraction: float, point: list, distance: float):
+        self.first = first
+        self.second = second
+        self.fraction = fraction
+        self.point = point
+        self.distance = distance
+
+
+# Spatial index over the edges of a graph snapshot for snapping points to the nearest street instead of
+# the nearest intersection
+# Edges are treated as straight segments between their nodes, and each segment is split into short pieces
+# whose midpoints are indexed, since the midpoints of long segments alone can be far from their nearest part
+class EdgeIndex():
+    def __init__(self, graph, piece_length=EDGE_PIECE_LENGTH):
+        self.graph = graph
+        self.piece_length = piece_length
+        self.reference_lat = float(np.mean(graph.lat)) if graph.node_count > 0 else 0.0
+
+        # Each street is indexed once no matter how many directions it can be driven in
+        sources = np.repeat(np.arange(graph.node_count), np.diff(np.asarray(graph.indptr)))
+        targets = np.asarray(graph.indices, dtype=np.int64)
+        segments = np.unique(np.column_stack((np.minimum(sources, targets), np.maximum(sources, targets))), axis=0)
+        self.segments = segments[segments[:, 0] != segments[:, 1]]
+
+        xy = project(graph.lat, graph.lon, self.reference_lat)
+        self.starts = xy[self.segments[:, 0]]
+        self.vectors = xy[self.segments[:, 1]] - self.starts
+
+        # Split every segment into pieces no longer than the piece length and index their midpoints
+        lengths = np.hypot(self.vectors[:, 0], self.vectors[:, 1])
+        piece_counts = np.maximum(np.ceil(lengths / piece_length).astype(np.int64), 1)
+        self.piece_segments = np.repeat(np.arange(len(self.segments)), piece_counts)
+        piece_starts = np.cumsum(piece_counts) - piece_counts
+        offsets = (np.arange(len(self.piece_segments)) - piece_starts[self.piece_segments] + 0.5) / piece_counts[self.piece_segments]
+        midpoints = self.starts[self.piece_segments] + self.vectors[self.piece_segments] * offsets[:, None]
+        self.tree = cKDTree(midpoints) if len(midpoints) > 0 else None
+
+
+    # Approximate memory used by the index in bytes, counting the KD-tree as a copy of the midpoints and their order
+    @property
+    def nbytes(self):
+        return self.segments.nbytes + self.starts.nbytes + self.vectors.nbytes + self.piece_segments.nbytes + len(self.piece_segments) * 24
+
+
+    # Get the distance of a planar point to each of the given segments along with the fraction of the
+    # segment where the point projects to
+    def measure(self, xy, segments):
+        vectors = self.vectors[segments]
+        offsets = xy - self.starts[segments]
+        lengths = np.einsum("ij,ij->i", vectors, vectors)
+        fractions = np.clip(np.einsum("ij,ij->i", offsets, vectors) / np.where(lengths > 0, lengths, 1), 0.0, 1.0)
+        differences = offsets - vectors * fractions[:, None]
+        return np.hypot(differences[:, 0], differences[:, 1]), fractions
+
+
+    # Project each geological point on its nearest edge
+    def nearest(self, points: list):
+        if self.tree is None:
+            raise ValueError("The graph has no edges to snap to")
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        xy = project(points[:, 0], points[:, 1], self.reference_lat)
+        k = min(EDGE_CANDIDATES, len(self.piece_segments))
+        _, candidates = self.tree.query(xy, k=k)
+
+        projections = []
+        for point_xy, point_candidates in zip(xy, candidates.reshape(-1, k)):
+            segments = np.unique(self.piece_segments[point_candidates])
+            distances, _ = self.measure(point_xy, segments)
+
+            # The nearest segment has a piece whose midpoint is at most half a piece farther than the segment
+            # itself, so every piece within that radius of the best candidate so far has to be checked
+            radius = distances.min() + self.piece_length / 2
+            segments = np.unique(self.piece_segments[self.tree.query_ball_point(point_xy, r=radius)])
+            distances, fractions = self.measure(point_xy, segments)
+
+            best = int(distances.argmin())
+            first, second = self.segments[segments[best]].tolist()
+            fraction = float(fractions[best])
+            coords = np.asarray(self.graph.coords)
+            point = (coords[first] + (coords[second] - coords[first]) * fraction).tolist()
+            projections.append(EdgeProjection(first, second, fraction, point, float(distances[best])))
+
+        return projections
@@ -0,0 +1,273 @@
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from distance_matrix import get_csgraph
+from lru_cache import LRUCache
+from spatial_index import EdgeIndex, NodeIndex
+from street_routing import NoPathError, bidirectional_astar
+
+
+# Default bound of the path cache of each network, in total number of nodes stored across all the paths
+PATH_CACHE_SIZE = 1_000_000
+
+# Approximate memory used by each node of a cached path in bytes, as a pointer in a tuple to a Python int
+PATH_NODE_BYTES = 40
+
+
+# Street graph along with everything derived from it that is needed to answer routing requests
+class StreetNetwork():
+    def __init__(self, graph, hierarchy=None, path_cache_size=PATH_CACHE_SIZE, name=None, tile_names=()):
+        self.name = name
+        self.graph = graph
+
+        # Names of the tiles the graph was made of, used by other processes to load the same graph
+        self.tile_names = tuple(tile_names)
+
+        # Index the coordinates of the nodes to quickly snap geological points to the graph
+        self.node_index = NodeIndex(graph)
+
+        # Index of the edges for snapping points to the nearest street, only built when first needed
+        self.edge_index = None
+
+        # Contraction hierarchy of the graph if it was built with contraction_hierarchy.py
+        self.hierarchy = hierarchy
+
+        # Shortest paths between pairs of nodes shared by all the endpoints
+        # Cached paths refer to the nodes of this graph, so they go away together with the network
+        self.path_cache = LRUCache(path_cache_size, get_size=len)
+
+        # Sparse matrix of the graph used by the scipy graph algorithms, only built when first needed
+        self.csgraph = None
+
+        # Called whenever the network grows, such as when a path is cached or an index is built, so that whoever
+        # bounds the memory of the networks can measure it again
+        self.on_resize = None
+
+
+    # Approximate memory used by the network in bytes, counting the KD-tree as a copy of the projected coordinates
+    # along with the cached paths and the edge index and sparse matrix once they are built
+    @property
+    def nbytes(self):
+        size = self.graph.nbytes + self.graph.node_count * 16 + self.path_cache.size * PATH_NODE_BYTES
+        if self.hierarchy is not None:
+            size += self.hierarchy.nbytes
+        if self.edge_index is not None:
+            size += self.edge_index.nbytes
+        if self.csgraph is not None:
+            size += self.csgraph.data.nbytes + self.csgraph.indices.nbytes + self.csgraph.indptr.nbytes
+
+        return size
+
+
+    # Let whoever bounds the memory of the networks know that the network grew
+    def resized(self):
+        if self.on_resize is not None:
+            self.on_resize()
+
+
+    # Get the nearest node of each geological point
+    def snap(self, points: list):
+        return self.node_index.nearest(points)
+
+
+    # Get the OpenStreetMap id of the nearest node of each geological point
+    # With exact, points that are not exactly at a node get None instead, such as points projected on edges
+    def get_node_ids(self, points: list, exact=False):
+        nodes = self.snap(points)
+        node_ids = np.asarray(self.graph.node_ids)[nodes].tolist()
+        if not exact:
+            return node_ids
+
+        matches = np.all(self.graph.coords[nodes] == np.asarray(points, dtype=np.float64).reshape(-1, 2), axis=1)
+        return [node_id if match else None for node_id, match in zip(node_ids, matches.tolist())]
+
+
+    # Project each geological point on its nearest edge, building the edge index on first use
+    def snap_to_edges(self, points: list):
+        if self.edge_index is None:
+            self.edge_index = EdgeIndex(self.graph)
+            self.resized()
+
+        return self.edge_index.nearest(points)
+
+
+    # Find the shortest path between two nodes of the street graph
+    # Uses the contraction hierarchy when it is available, which gives the same paths as A* much faster
+    def shortest_path(self, source: int, target: int, weight="length"):
+        path = self.get_cached_path(source, target, weight)
+        if path is not None:
+            return path
+
+        if self.hierarchy is not None:
+            path = self.hierarchy.shortest_path(source, target)
+        else:
+            path = bidirectional_astar(self.graph, source, target)
+
+        self.cache_path(source, target, path, weight)
+        return path
+
+
+    # Get the cached shortest path between two nodes, or None if it was not found yet
+    def get_cached_path(self, source: int, target: int, weight="length"):
+        path = self.path_cache.get((source, target, weight))
+        return list(path) if path is not None else None
+
+
+    # Cache a shortest path between two nodes that was found elsewhere, such as by another process
+    def cache_path(self, source: int, target: int, path: list, weight="length"):
+        self.path_cache.put((source, target, weight), tuple(path))
+        self.resized()
+
+
+    # Get the length of an edge in meters, or None if there is no edge going that way
+    def get_edge_length(self, source: int, target: int):
+        neighbors, lengths = self.graph.neighbors(source)
+        for neighbor, length in zip(neighbors, lengths):
+            if neighbor == target:
+                return length
+
+        return None
+
+
+    # Get the length of a path in meters
+    def get_path_length(self, path: list):
+        return sum(self.get_edge_length(source, target) for source, target in zip(path, path[1:]))
+
+
+    # Get the nodes that can be reached from a projected point along its edge, with the distance to each one
+    def get_projection_exits(self, projection):
+        exits = {}
+
+        length = self.get_edge_length(projection.first, projection.second)
+        if length is not None:
+            exits[projection.second] = (1 - projection.fraction) * length
+
+        length = self.get_edge_length(projection.second, projection.first)
+        if length is not None:
+            exits[projection.first] = min(exits.get(projection.first, float("inf")), projection.fraction * length)
+
+        return exits
+
+
+    # Find the nearest nodes that can be walked to from a geological point within max_distance meters with a single
+    # bounded search that walks the streets in both directions, such as the nodes where transport routes pass
+    # get_groups gives the groups of a node by its OpenStreetMap id, such as the routes that pass through it, and
+    # nodes are only kept if they are in a group that no nearer node is in, which gives up to count nodes that
+    # lead to different groups instead of the nodes right next to each other on the nearest group
+    # The point is snapped to its nearest node, or projected on its nearest edge if snap is "edge"
+    # Returns (node_id, distance, coords) for each node from the nearest, where coords is the walk from the point
+    def find_walking_access(self, point: list, get_groups, max_distance: float, count: int, snap="node"):
+        if snap == "edge":
+            projection = self.snap_to_edges([point])[0]
+            length = self.get_edge_length(projection.first, projection.second)
+            if length is None:
+                length = self.get_edge_length(projection.second, projection.first)
+            sources = {projection.first: projection.fraction * length}
+            sources[projection.second] = min(sources.get(projection.second, float("inf")), (1 - projection.fraction) * length)
+            start = [projection.point]
+        else:
+            sources = {self.snap([point])[0]: 0.0}
+            start = []
+
+        # Search from every node the point is snapped to at once and keep the nearest one for each node
+        source_nodes = list(sources)
+        distances, predecessors = dijkstra(self.get_csgraph(), directed=False, indices=source_nodes, limit=max_distance, return_predecessors=True)
+        distances = distances + np.asarray([sources[node] for node in source_nodes])[:, None]
+        rows = np.argmin(distances, axis=0)
+        nearest = distances[rows, np.arange(distances.shape[1])]
+
+        reached = np.nonzero(nearest <= max_distance)[0]
+        reached = reached[np.argsort(nearest[reached], kind="stable")]
+
+        access = []
+        groups = set()
+        for node, node_id in zip(reached.tolist(), np.asarray(self.graph.node_ids)[reached].tolist()):
+            node_groups = set(get_groups(node_id)) - groups
+            if len(node_groups) == 0:
+                continue
+
+            groups |= node_groups
+            path = [node]
+            while path[-1] != source_nodes[rows[node]]:
+                path.append(int(predecessors[rows[node], path[-1]]))
+            path.reverse()
+
+            coords = start + self.get_coords(path)
+            access.append((node_id, float(nearest[node]), [point for index, point in enumerate(coords) if index == 0 or point != coords[index - 1]]))
+            if len(access) >= count:
+                break
+
+        return access
+
+
+    # Get the nodes that a projected point can be reached from along its edge, with the distance from each one
+    def get_projection_entries(self, projection):
+        entries = {}
+
+        length = self.get_edge_length(projection.first, projection.second)
+        if length is not None:
+            entries[projection.first] = projection.fraction * length
+
+        length = self.get_edge_length(projection.second, projection.first)
+        if length is not None:
+            entries[projection.second] = min(entries.get(projection.second, float("inf")), (1 - projection.fraction) * length)
+
+        return entries
+
+
+    # Find the shortest path between two points projected on edges by snap_to_edges
+    # Each projected point acts as a virtual node on its edge that leads to the nodes at both ends of the edge,
+    # so the shortest path is the best combination of the ends of the two edges
+    # Returns the geological coordinates of the path, which start and end at the projected points themselves
+    def shortest_projected_path(self, source, target):
+        best_distance = float("inf")
+        best_path = None
+
+        # Points on the same edge can be connected directly along it if the edge goes that way
+        if {source.first, source.second} == {target.first, target.second}:
+            fraction = target.fraction if target.first == source.first else 1 - target.fraction
+            if fraction >= source.fraction:
+                length = self.get_edge_length(source.first, source.second)
+            else:
+                length = self.get_edge_length(source.second, source.first)
+
+            if length is not None:
+                best_distance = abs(fraction - source.fraction) * length
+                best_path = []
+
+        entries = self.get_projection_entries(target)
+        for exit_node, exit_distance in self.get_projection_exits(source).items():
+            for entry_node, entry_distance in entries.items():
+                if exit_distance + entry_distance >= best_distance:
+                    continue
+
+                try:
+                    path = self.shortest_path(exit_node, entry_node)
+                except NoPathError:
+                    continue
+
+                distance = exit_distance + self.get_path_length(path) + entry_distance
+                if distance < best_distance:
+                    best_distance = distance
+                    best_path = path
+
+        if best_path is None:
+            raise NoPathError("No path between the projected points")
+
+        # Points projected right on a node would otherwise appear twice
+        coords = [source.point] + self.get_coords(best_path) + [target.point]
+        return [point for index, point in enumerate(coords) if index == 0 or point != coords[index - 1]]
+
+
+    # Get the sparse matrix of the graph, building it on first use
+    def get_csgraph(self):
+        if self.csgraph is None:
+            self.csgraph = get_csgraph(self.graph)
+            self.resized()
+
+        return self.csgraph
+
+
+    # Convert a list of nodes into geological coordinates
+    def get_coords(self, nodes: list):
+        return self.graph.get_coords(nodes)
@@ -0,0 +1,126 @@
+import heapq
+
+from geo import get_distances
+
+
+# Raised when there is no path between two nodes of the street graph
+class NoPathError(Exception):
+    pass
+
+
+# Follow the predecessors of a search back to the source node
+def build_path(predecessors: dict, node: int):
+    path = [node]
+    while predecessors[node] is not None:
+        node = predecessors[node]
+        path.append(node)
+
+    path.reverse()
+    return path
+
+
+# Find the shortest path between two nodes of a graph snapshot using Dijkstra's algorithm
+def dijkstra_path(graph, source: int, target: int):
+    distances = {source: 0.0}
+    predecessors = {source: None}
+    settled = set()
+    queue = [(0.0, source)]
+
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+
+        if node == target:
+            return build_path(predecessors, target)
+
+        settled.add(node)
+
+        neighbors, lengths = graph.neighbors(node)
+        for neighbor, length in zip(neighbors, lengths):
+            new_distance = distance + length
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = node
+                heapq.heappush(queue, (new_distance, neighbor))
+
+    raise NoPathError(f"No path from node {source} to node {target}")
+
+
+# Scale the straight-line distances down a little so that rounding in the stored edge lengths
+# can never make the heuristic overestimate the remaining distance
+HEURISTIC_SCALE = 0.999
+
+
+# Get the straight-line distance in meters from every node of a graph snapshot to a geological point
+def get_heuristic(graph, point):
+    return (get_distances(graph.coords[:, 0], graph.coords[:, 1], point) * 1000 * HEURISTIC_SCALE).tolist()
+
+
+# Find the shortest path between two nodes of a graph snapshot using bidirectional A*
+# Both searches use the average of the haversine distances to the source and target as their potential,
+# which keeps the potentials consistent so the first time the two searches meet under the stopping
+# condition the best path found is the shortest one
+def bidirectional_astar(graph, source: int, target: int):
+    if source == target:
+        return [source]
+
+    to_target = get_heuristic(graph, graph.coords[target])
+    to_source = get_heuristic(graph, graph.coords[source])
+
+    # Potential of the forward search, the backward search uses its negation
+    def potential(node):
+        return (to_target[node] - to_source[node]) / 2
+
+    forward_distances = {source: 0.0}
+    backward_distances = {target: 0.0}
+    forward_predecessors = {source: None}
+    backward_predecessors = {target: None}
+    forward_queue = [(potential(source), 0.0, source)]
+    backward_queue = [(-potential(target), 0.0, target)]
+
+    # Length of the best path found so far and the node where its two halves meet
+    best_distance = float("inf")
+    meeting_node = None
+
+    while forward_queue and backward_queue:
+        # Stop once no unsettled node can lead to a shorter path
+        if forward_queue[0][0] + backward_queue[0][0] >= best_distance:
+            break
+
+        # Expand the search whose next node is closer
+        if forward_queue[0][0] <= backward_queue[0][0]:
+            queue, distances, predecessors = forward_queue, forward_distances, forward_predecessors
+            other_distances, get_edges, sign = backward_distances, graph.neighbors, 1
+        else:
+            queue, distances, predecessors = backward_queue, backward_distances, backward_predecessors
+            other_distances, get_edges, sign = forward_distances, graph.reverse_neighbors, -1
+
+        _, distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+
+        neighbors, lengths = get_edges(node)
+        for neighbor, length in zip(neighbors, lengths):
+            new_distance = distance + length
+            if new_distance < distances.get(neighbor, float("inf")):
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = node
+                heapq.heappush(queue, (new_distance + sign * potential(neighbor), new_distance, neighbor))
+
+                # Check if the two searches meet at the neighbor with a shorter path
+                if neighbor in other_distances and new_distance + other_distances[neighbor] < best_distance:
+                    best_distance = new_distance + other_distances[neighbor]
+                    meeting_node = neighbor
+
+    if meeting_node is None:
+        raise NoPathError(f"No path from node {source} to node {target}")
+
+    # Join the path from the source to the meeting node with the path from the meeting node to the target
+    path = build_path(forward_predecessors, meeting_node)
+    node = backward_predecessors[meeting_node]
+    while node is not None:
+        path.append(node)
+        node = backward_predecessors[node]
+
+    return path
@@ -0,0 +1,620 @@
+import bisect
+import itertools
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from geo import get_distances, get_pair_distances, get_segment_distances
+from spatial_index import project
+
+
+# Scale the straight-line distances to the end down a little so that rounding can never make them longer
+# than the distance left to ride
+HEURISTIC_SCALE = 0.999
+
+# Ride distances that differ by less than this many meters count as the same, since they add up rounding errors
+DISTANCE_TOLERANCE = 0.01
+
+# Farthest that riders walk in meters to transfer between routes that pass near each other without meeting
+WALKING_TRANSFER_RADIUS = 150.0
+
+# Planar distances between points of the spatial index of the route points are a little off from the haversine
+# distances, so the points within the walking radius are looked up with this much more and then measured
+WALKING_SEARCH_MARGIN = 1.01
+
+# Orders that the top route combinations can be ranked in, as the sort key of a combination from its number of
+# transfers, its ride distance and its walking distance
+RANKINGS = {
+    "transfers": lambda transfers, distance, walking: (transfers, distance, walking),
+    "distance": lambda transfers, distance, walking: (distance, transfers, walking),
+    "walking": lambda transfers, distance, walking: (walking, transfers, distance),
+}
+
+
+# Routes are stored as the OpenStreetMap ids of the street graph nodes they pass through, packed as little-endian
+# 64-bit integers, which is much smaller and faster to read than their coordinates as JSON text
+def pack_nodes(nodes: list):
+    return np.asarray(nodes, dtype="<i8").tobytes()
+
+
+# Read the node ids of a route stored by pack_nodes
+def unpack_nodes(data):
+    return np.frombuffer(bytes(data), dtype="<i8").tolist()
+
+
+# Get the indexes of the routes in a bitset of routes, which is an integer with the bit of each route set
+def get_mask_routes(mask: int):
+    routes = []
+    while mask:
+        lowest = mask & -mask
+        routes.append(lowest.bit_length() - 1)
+        mask ^= lowest
+
+    return routes
+
+
+# Index from each street graph node of a set of transport routes to the routes and positions that pass through it
+# Built once for the candidate routes of a request and shared by every step of the route finding
+# Each route has the ids of its nodes in "nodes" and their coordinates in "coords", although only the nodes are
+# needed to find connections
+# Route steps are handled as (route, first, last) tuples, where route is the index of a candidate route and
+# first and last are the positions in its nodes where the step starts and ends
+# Connections between the routes are read from the connections stored with each route, see find_connections,
+# and are only found from the nodes for the routes that have none stored
+# Riders can also walk up to walking_radius meters between routes that pass near each other, which needs the
+# coordinates of the routes, and walking transfers are left out if it is 0
+class TransitIndex():
+    def __init__(self, routes: list, connections=None, walking_radius=WALKING_TRANSFER_RADIUS):
+        self.routes = routes
+        self.walking_radius = walking_radius
+
+        # Node ids of each route
+        self.keys = [route["nodes"] for route in routes]
+
+        # Sorted positions of each node in each route, and the routes that pass through each node
+        self.positions = []
+        self.node_routes = {}
+        for route, keys in enumerate(self.keys):
+            positions = {}
+            for position, key in enumerate(keys):
+                positions.setdefault(key, []).append(position)
+            self.positions.append(positions)
+
+            for key in positions:
+                self.node_routes.setdefault(key, []).append(route)
+
+        # Distance in meters along each route from its first node to each of its nodes, computed when first needed
+        self.offsets = [None] * len(routes)
+
+        # Stored connections of each route, and the routes and positions that riders can transfer to from each
+        # position of each route, which are only built for the routes that the route finding reaches
+        self.connections = connections if connections is not None else [None] * len(routes)
+        self.route_indexes = {route["id"]: index for index, route in enumerate(routes)}
+        self.transfers = [None] * len(routes)
+
+        # Routes without stored connections, which the stored connections of the other routes may not include
+        self.unconnected = {route for route, route_connections in enumerate(self.connections) if route_connections is None}
+
+        # Spatial index of the points of every route for finding walking transfers, built when first needed
+        self.point_index = None
+
+        # Bitsets of the routes that riders can transfer to from each route, built when first needed
+        self.route_masks = None
+
+
+    # Check if a node is on one of the routes
+    def __contains__(self, node):
+        return node in self.node_routes
+
+
+    # Get the routes that pass through a node along with every position where they do
+    def get_stops(self, node):
+        return [(route, self.positions[route][node]) for route in self.node_routes.get(node, [])]
+
+
+    # Get the distance in meters along a route from its first node to each of its nodes
+    def get_offsets(self, route: int):
+        if self.offsets[route] is None:
+            coords = self.routes[route]["coords"]
+            offsets = np.zeros(len(coords))
+            if len(coords) > 1:
+                offsets[1:] = np.cumsum(get_segment_distances(coords)) * 1000
+            self.offsets[route] = offsets.tolist()
+
+        return self.offsets[route]
+
+
+    # Build the spatial index of the points of every route, which are projected to planar coordinates in meters
+    # Returns the KD-tree of the points along with the route, the position, the node and the coordinates of each
+    # point, and the reference latitude of the projection
+    def get_point_index(self):
+        if self.point_index is None:
+            coords = np.asarray([coord for route in self.routes for coord in route["coords"]], dtype=np.float64).reshape(-1, 2)
+            reference_lat = float(coords[:, 0].mean()) if len(coords) > 0 else 0.0
+            point_routes = np.repeat(np.arange(len(self.routes)), [len(keys) for keys in self.keys])
+            point_positions = np.concatenate([np.arange(len(keys)) for keys in self.keys] + [np.zeros(0, dtype=np.int64)])
+            point_keys = np.asarray([key for keys in self.keys for key in keys], dtype=np.int64)
+            tree = cKDTree(project(coords[:, 0], coords[:, 1], reference_lat))
+            self.point_index = (tree, point_routes, point_positions, point_keys, coords, reference_lat)
+
+        return self.point_index
+
+
+    # Find where riders can walk from each position of a route to the other routes of the index, or only to the
+    # given other routes, within the walking radius
+    # The points near the route are found with the spatial index and measured with the haversine distance all at
+    # once, and only the nearest position of each other route is kept for each position, leaving out the positions
+    # where the routes already meet, since riders transfer there without walking
+    # Returns [position, other_position, meters] for each other route, keyed by the id of the other route as text
+    def find_walking_connections(self, route: int, others=None):
+        connections = {}
+        if self.walking_radius <= 0 or len(self.keys[route]) == 0:
+            return connections
+
+        tree, point_routes, point_positions, point_keys, point_coords, reference_lat = self.get_point_index()
+        route_coords = np.asarray(self.routes[route]["coords"], dtype=np.float64).reshape(-1, 2)
+        xy = project(route_coords[:, 0], route_coords[:, 1], reference_lat)
+        candidates = tree.query_ball_point(xy, r=self.walking_radius * WALKING_SEARCH_MARGIN)
+
+        # Pairs of each position of the route with each point near it on the other routes
+        positions = np.repeat(np.arange(len(candidates)), [len(points) for points in candidates])
+        points = np.concatenate([np.asarray(points, dtype=np.int64) for points in candidates])
+        others_mask = point_routes[points] != route
+        if others is not None:
+            others_mask &= np.isin(point_routes[points], list(others))
+        positions, points = positions[others_mask], points[others_mask]
+
+        # Other routes that meet the route at a position are at the same node
+        keys = np.asarray(self.keys[route], dtype=np.int64)
+        pair_keys = positions * len(self.routes) + point_routes[points]
+        meeting = pair_keys[point_keys[points] == keys[positions]]
+
+        distances = get_pair_distances(route_coords[positions], point_coords[points]) * 1000
+        within = (distances <= self.walking_radius) & ~np.isin(pair_keys, meeting)
+        positions, points, distances, pair_keys = positions[within], points[within], distances[within], pair_keys[within]
+
+        # Keep the nearest point of each other route for each position
+        order = np.lexsort((distances, pair_keys))
+        _, first = np.unique(pair_keys[order], return_index=True)
+        nearest = order[first]
+
+        pairs = zip(
+            point_routes[points[nearest]].tolist(),
+            positions[nearest].tolist(),
+            point_positions[points[nearest]].tolist(),
+            np.round(distances[nearest], 1).tolist(),
+        )
+        for other, position, other_position, distance in pairs:
+            connections.setdefault(str(self.routes[other]["id"]), []).append([position, other_position, distance])
+
+        return connections
+
+
+    # Find where a route meets the other routes of the index, or only the given other routes
+    # Returns the pairs of positions in both routes that are at the same node for each other route, keyed
+    # by the id of the other route as text, which is the format of the connections stored with each route
+    # Walking transfers are added after them as [position, other_position, meters], see find_walking_connections
+    def find_connections(self, route: int, others=None):
+        route_id = self.routes[route]["id"]
+        connections = {}
+
+        for key, positions in self.positions[route].items():
+            for other in self.node_routes[key]:
+                other_id = self.routes[other]["id"]
+                if other_id == route_id or (others is not None and other not in others):
+                    continue
+
+                pairs = connections.setdefault(str(other_id), [])
+                for position in positions:
+                    for other_position in self.positions[other][key]:
+                        pairs.append([position, other_position])
+
+        for pairs in connections.values():
+            pairs.sort()
+
+        for other_id, pairs in self.find_walking_connections(route, others).items():
+            connections.setdefault(other_id, []).extend(pairs)
+
+        return connections
+
+
+    # Get the routes and positions that riders can transfer to from a position of a route, along with the distance
+    # in meters that they walk to transfer, which is 0 where the routes meet
+    # Connections to routes that are not in the index, such as routes that are not running, are left out
+    def get_transfers(self, route: int, position: int):
+        if self.transfers[route] is None:
+            route_connections = self.connections[route]
+            if route_connections is None:
+                route_connections = self.find_connections(route)
+            elif self.unconnected:
+                route_connections = dict(route_connections, **self.find_connections(route, self.unconnected))
+
+            transfers = {}
+            for other_id, pairs in route_connections.items():
+                other = self.route_indexes.get(int(other_id))
+                if other is None or other == route:
+                    continue
+
+                for pair in pairs:
+                    walk = pair[2] if len(pair) > 2 else 0.0
+                    transfers.setdefault(pair[0], []).append((other, pair[1], walk))
+
+            self.transfers[route] = transfers
+
+        return self.transfers[route].get(position, [])
+
+
+    # Get the bitset of the routes that pass through any of a list of nodes, which is the coverage of the nodes by
+    # the routes read from the index of the nodes instead of a bitset of the nodes kept for each route
+    def get_nodes_mask(self, nodes):
+        mask = 0
+        for node in nodes:
+            for route in self.node_routes.get(node, []):
+                mask |= 1 << route
+
+        return mask
+
+
+    # Get the bitset of the routes that riders can transfer to from each route, built from the ids of the other
+    # routes in the stored connections
+    # These bitsets over routes stand in for bitsets of the nodes or grid cells each route covers: the index of the
+    # nodes already gives the routes at any node, see get_nodes_mask, so which routes can possibly connect is all
+    # that is left to answer with bitwise operations
+    # Only the routes without stored connections have them found, and since routes meet and pass near each other
+    # both ways, each route they connect to gets them added to its bitset as well
+    def get_route_masks(self):
+        if self.route_masks is None:
+            route_masks = []
+            for route, route_connections in enumerate(self.connections):
+                mask = 0
+                for other_id in route_connections or {}:
+                    other = self.route_indexes.get(int(other_id))
+                    if other is not None and other != route:
+                        mask |= 1 << other
+                route_masks.append(mask)
+
+            for route in self.unconnected:
+                self.get_transfers(route, 0)
+                for transfers in self.transfers[route].values():
+                    for other, _, _ in transfers:
+                        route_masks[route] |= 1 << other
+                        route_masks[other] |= 1 << route
+
+            self.route_masks = route_masks
+
+        return self.route_masks
+
+
+    # Get the fewest transfers from each route to any of the routes in a bitset, which are found a whole round of
+    # transfers at a time with bitwise operations on the bitsets of the routes
+    # Routes that cannot get to any of them with any number of transfers are left out
+    def get_route_hops(self, mask: int):
+        route_masks = self.get_route_masks()
+        hops = {}
+        reached = mask
+        frontier = mask
+        level = 0
+        while frontier:
+            for route in get_mask_routes(frontier):
+                hops[route] = level
+
+            # Routes that were not reached yet and can transfer to a route of the frontier
+            previous = frontier
+            frontier = 0
+            for route, route_mask in enumerate(route_masks):
+                if route_mask & previous and not reached >> route & 1:
+                    frontier |= 1 << route
+            reached |= frontier
+            level += 1
+
+        return hops
+
+
+    # Convert a route step into a copy of its route with only the coordinates of the step
+    def get_route_step(self, step: tuple):
+        route, first, last = step
+        route_step = {key: value for key, value in self.routes[route].items() if key != "nodes"}
+        route_step["coords"] = route_step["coords"][first:last + 1]
+        return route_step
+
+
+# Find where each route meets the other routes, in the format of the connections stored with each route
+# Only the ids and the nodes of the routes are needed if walking transfers are left out with a walking radius of 0
+def get_connections(routes: list, walking_radius=WALKING_TRANSFER_RADIUS):
+    transit_index = TransitIndex(routes, walking_radius=walking_radius)
+    return [transit_index.find_connections(route) for route in range(len(routes))]
+
+
+# Get a function that gives the straight-line distance in meters from a position of a route to the nearest of a
+# list of coordinates, scaled down so that it is a lower bound of the distance left to ride, computed for each
+# route when first needed
+def get_distance_bound(transit_index: TransitIndex, targets: list):
+    distances = {}
+
+    def get_distance(route: int, position: int):
+        if route not in distances:
+            coords = np.asarray(transit_index.routes[route]["coords"], dtype=np.float64).reshape(-1, 2)
+            nearest = np.min([get_distances(coords[:, 0], coords[:, 1], target) for target in targets], axis=0)
+            distances[route] = (nearest * 1000 * HEURISTIC_SCALE).tolist()
+
+        return distances[route][position]
+
+    return get_distance
+
+
+# Follow a label of the search back to the start and get the route steps that lead to it
+def get_label_steps(label: tuple):
+    steps = []
+    while label[1] is not None:
+        steps.append(label[1])
+        label = label[2]
+
+    steps.reverse()
+    return steps
+
+
+# Labels of a node in the top search, kept as the best ride distance of each sequence of routes that got to the
+# node and the k shortest ride distances with each number of transfers
+class LabelBag():
+    def __init__(self, k: int):
+        self.k = k
+        self.sequences = {}
+        self.levels = []
+
+
+    # Check if a label is beaten by the labels of the node
+    # A label is beaten by a label of the same sequence of routes with a shorter ride, since only the best place to
+    # transfer between the same routes is worth keeping, or by k labels that are better on both transfers and
+    # distance, since whatever follows the label also follows those and gives k better combinations
+    # Routes are never ridden twice, which can rarely keep the rest of a label from following the labels that beat
+    # it, so the search is a close and fast approximation of the exact top k rather than an exact one
+    def is_dominated(self, transfers: int, distance: float, sequence: tuple):
+        other_distance = self.sequences.get(sequence)
+        if other_distance is not None and other_distance <= distance + DISTANCE_TOLERANCE:
+            return True
+
+        count = 0
+        for level in self.levels[:transfers + 1]:
+            count += bisect.bisect_right(level, distance + DISTANCE_TOLERANCE)
+            if count >= self.k:
+                return True
+
+        return False
+
+
+    # Add a label that is not beaten by the labels of the node
+    # A label of the same sequence that rode farther is replaced by this one
+    def add(self, transfers: int, distance: float, sequence: tuple):
+        while len(self.levels) <= transfers:
+            self.levels.append([])
+
+        level = self.levels[transfers]
+        other_distance = self.sequences.get(sequence)
+        if other_distance is not None:
+            index = bisect.bisect_left(level, other_distance)
+            if index < len(level) and level[index] == other_distance:
+                del level[index]
+
+        self.sequences[sequence] = distance
+        bisect.insort(level, distance)
+        del level[self.k:]
+
+
+# Add a label to the labels that are riding a route, keeping only the k with the shortest distance so far and
+# only the best one of each sequence of routes
+# Riding labels are (value, position, label, walked), where value is the distance minus the offset of the position
+# where the label boarded the route, so that the distance anywhere further along the route is value + offset, and
+# walked is the distance walked to transfer so far
+def add_riding_label(riding: list, value: float, position: int, label: tuple, walked: float, k: int):
+    if len(riding) >= k and value >= riding[-1][0]:
+        return
+
+    for index, (other_value, _, other_label, _) in enumerate(riding):
+        if other_label[4] == label[4]:
+            if other_value <= value:
+                return
+            del riding[index]
+            break
+
+    bisect.insort(riding, (value, position, label, walked), key=lambda riding_label: riding_label[0])
+    del riding[k:]
+
+
+# Convert a combination of the top search into (transfers, distance, walked, steps), see iter_top_journeys
+def get_journey(journey: tuple):
+    _, _, label, walked = journey
+    return (label[3], label[0] - label[5], walked, get_label_steps(label))
+
+
+# Find the k best route combinations from the start to the end of a transit network in the order of a ranking
+# Works in rounds like RAPTOR, where round n rides every route that can be boarded from the labels added in the
+# previous round once from its earliest such position, so the labels of round n have n transfers
+# Every node keeps a bag of labels instead of only the best one, where a label is dropped if it is beaten by
+# others, see LabelBag, and each route is ridden with its k best labels
+# The best combinations found so far are kept in a list bounded to k, and labels that cannot beat the worst of
+# them even with the straight-line distance left to the end are dropped like in A*
+# Only the shortest ride of each sequence of routes is kept and no route is ridden twice, so the combinations are
+# actually different, and the search stops with the best combinations found so far after time_budget seconds
+# Routes that cannot get to any end are never boarded, see TransitIndex.get_route_hops, and neither are labels
+# that cannot beat the worst combination with the fewest transfers left from the route
+# Riders can start at any of the starts and stop at any of the ends, which map node ids to the distance in meters
+# walked from the origin to them or from them to the destination
+# Labels are compared by their distance, which is the ride distance along with the distance walked, and
+# combinations are ranked by the ride distance and by the distance walked from the origin, to transfer, and to
+# the destination
+# Combinations are yielded in the order of the ranking as soon as no combination found later can beat them, which is
+# once the bound of the labels of a round is not better than them, and the rest are yielded when the search stops
+# Yields (transfers, distance, walked, steps) for each combination, where distance is the ride distance, walked is
+# the distance walked, and steps is a list of (route, first, last)
+# Returns False if the time budget ran out before the search was done, in which case better combinations may have
+# been missed
+def iter_top_journeys(transit_index: TransitIndex, starts: dict, ends: dict, k: int, criterion="transfers", time_budget=None):
+    rank = RANKINGS[criterion]
+    routes = transit_index.routes
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    starts = {node: walk for node, walk in starts.items() if node in transit_index}
+    ends = {node: walk for node, walk in ends.items() if node in transit_index}
+    if len(starts) == 0 or len(ends) == 0 or k <= 0:
+        return True
+
+    # Starting where riders could stop is just boarding the first route that passes through it
+    common = [node for node in starts if node in ends]
+    if len(common) > 0:
+        node = min(common, key=lambda node: starts[node] + ends[node])
+        route, positions = transit_index.get_stops(node)[0]
+        yield (0, 0.0, starts[node] + ends[node], [(route, positions[0], positions[0])])
+        return True
+
+    # Fewest transfers from each route to a route through an end, so routes that cannot get to any end are never
+    # boarded, and nothing is searched if none of the routes through the starts can get to one
+    hops = transit_index.get_route_hops(transit_index.get_nodes_mask(ends))
+    if not any(route in hops for route in get_mask_routes(transit_index.get_nodes_mask(starts))):
+        return True
+
+    end_coords = []
+    for node in ends:
+        route, positions = transit_index.get_stops(node)[0]
+        end_coords.append(routes[route]["coords"][positions[0]])
+    get_end_distance = get_distance_bound(transit_index, end_coords)
+
+    # Every combination walks at least this much to the destination
+    end_walk = min(ends.values())
+
+    # Labels are tuples of the distance, the last route step, the previous label, the number of transfers, the ids
+    # of the routes ridden so far and the distance walked so far, and the labels added in each round are marked by
+    # node and by sequence
+    bags = {}
+    marked = {node: {(): (walk, None, None, -1, (), walk)} for node, walk in starts.items()}
+
+    # Best combinations so far as (rank, order, label, walked), sorted by their rank, where walked includes the
+    # walk to the destination
+    journeys = []
+    order = itertools.count()
+
+    # Number of the best combinations that were yielded
+    yielded = 0
+
+    complete = True
+    transfers = -1
+    while marked:
+        transfers += 1
+
+        # Labels of this round have one more transfer and ride at least as far as the labels they follow, so no
+        # combination found from now on can beat their bound
+        shortest = min(label[0] - label[5] for labels in marked.values() for label in labels.values())
+        least_walked = min(label[5] for labels in marked.values() for label in labels.values())
+        bound = rank(transfers, shortest, least_walked + end_walk)
+
+        while yielded < len(journeys) and journeys[yielded][0] <= bound:
+            yield get_journey(journeys[yielded])
+            yielded += 1
+
+        # Once none of them can beat the worst combination found the search is done
+        if len(journeys) >= k and bound >= journeys[-1][0]:
+            break
+
+        if deadline is not None and time.perf_counter() > deadline:
+            complete = False
+            break
+
+        # Get the labels that can board each route at each position from the labels added in the previous round
+        boardings = {}
+        for node, labels in marked.items():
+            for label in labels.values():
+                if label[1] is None:
+                    stops = [(route, position, 0.0) for route, positions in transit_index.get_stops(node) for position in positions]
+                else:
+                    stops = transit_index.get_transfers(label[1][0], label[1][2])
+
+                for route, position, walk in stops:
+                    if route not in hops or routes[route]["id"] in label[4]:
+                        continue
+
+                    # Labels that cannot beat the worst combination found even with the fewest transfers left
+                    # from the route are not boarded
+                    if len(journeys) >= k and rank(transfers + hops[route], label[0] - label[5], label[5] + walk + end_walk) >= journeys[-1][0]:
+                        continue
+
+                    boardings.setdefault(route, {}).setdefault(position, []).append((label, walk))
+
+        marked = {}
+        for route, route_boardings in boardings.items():
+            # Once the time is up, the routes left in the round are not ridden and the labels found so far are kept
+            if deadline is not None and time.perf_counter() > deadline:
+                complete = False
+                break
+
+            route_id = routes[route]["id"]
+            keys = transit_index.keys[route]
+            offsets = transit_index.get_offsets(route)
+            riding = []
+
+            for position in range(min(route_boardings), len(keys)):
+                node = keys[position]
+
+                # Get off at the node with the riding labels that are not beaten there
+                for value, first, label, walked in riding:
+                    if first == position:
+                        continue
+
+                    distance = value + offsets[position]
+                    bound = distance - walked + get_end_distance(route, position)
+                    if len(journeys) >= k and rank(transfers, bound, walked + end_walk) >= journeys[-1][0]:
+                        continue
+
+                    sequence = label[4] + (route_id,)
+                    bag = bags.get(node)
+                    if bag is None:
+                        bag = bags[node] = LabelBag(k)
+                    elif bag.is_dominated(transfers, distance, sequence):
+                        continue
+
+                    # A label of the same sequence that rode farther is replaced by this one
+                    bag.add(transfers, distance, sequence)
+                    marked.setdefault(node, {})[sequence] = (distance, (route, first, position), label, transfers, sequence, walked)
+
+                # Board here with the labels that can, keeping the k best ones on the route
+                for label, walk in route_boardings.get(position, []):
+                    add_riding_label(riding, label[0] + walk - offsets[position], position, label, label[5] + walk, k)
+
+        # Labels that got to an end are combinations, which are not ridden any further
+        # The same sequence of routes can get to several ends, and only its best combination is kept
+        for end, end_walk_distance in ends.items():
+            for label in marked.pop(end, {}).values():
+                walked = label[5] + end_walk_distance
+                journey_rank = rank(label[3], label[0] - label[5], walked)
+                same = next((index for index, journey in enumerate(journeys) if journey[2][4] == label[4]), None)
+                if same is not None:
+                    if journeys[same][0] <= journey_rank:
+                        continue
+                    del journeys[same]
+
+                bisect.insort(journeys, (journey_rank, next(order), label, walked))
+                del journeys[k:]
+
+    for journey in journeys[yielded:]:
+        yield get_journey(journey)
+
+    return complete
+
+
+# Helper function for obtaining the best route combinations that connect the user's location to the destination
+# Starts and ends map the node ids where riders can start and stop riding to the distance walked to or from them
+# Yields the steps of each combination as soon as it is found, see iter_top_journeys, along with its scores, where
+# distances are in meters, and the node ids where it starts and stops riding
+# Returns False if the time budget cut the search short, like iter_top_journeys
+def iter_complete_routes(transit_index: TransitIndex, starts: dict, ends: dict, k: int, criterion="transfers", time_budget=None):
+    journeys = iter_top_journeys(transit_index, starts, ends, k, criterion, time_budget)
+    while True:
+        try:
+            transfers, distance, walked, steps = next(journeys)
+        except StopIteration as stop:
+            return stop.value
+
+        yield (
+            [transit_index.get_route_step(step) for step in steps],
+            {"transfers": transfers, "ride_distance": round(distance, 1), "walking_distance": round(walked, 1)},
+            (transit_index.keys[steps[0][0]][steps[0][1]], transit_index.keys[steps[-1][0]][steps[-1][2]]),
+        )
@@ -5,6 +5,9 @@ from kivy.utils import platform
 from kivymd.uix.progressbar import MDProgressBar
 
 import argparse
+import json
+import requests
+import threading
 
 # Create the command-line argument parser
 parser = argparse.ArgumentParser()
@@ -135,3 +138,95 @@ class SendRequest():
 
         if callback is not None:
             callback(request, result)
+
+
+# Helper class to send an HTTP request whose response is streamed as newline-delimited JSON
+# The request runs in a background thread and on_record is called on the main thread with each record as soon as
+# it arrives, then on_success once the response ended, so the timeout only applies to the wait for the next line
+# instead of to the whole response
+class StreamRequest():
+    def __init__(self, url: str, loading_indicator: MDProgressBar, body=None, on_record=None, on_success=None, on_failure=None, auto_refresh=True) -> None:
+        self.url = url
+        self.body = body
+        self.on_record = on_record
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.auto_refresh = auto_refresh
+
+        # Set and start the loading indicator as a visual feedback for users that the app
+        # is waiting for an http request to be finished
+        self.loading_indicator = loading_indicator
+        self.loading_indicator.start()
+
+        threading.Thread(target=self.fetch, daemon=True).start()
+
+
+    # Send the request and read the records of the response line by line in the background thread
+    def fetch(self):
+        try:
+            with requests.post(self.url, data=self.body, headers=dict(HEADERS), stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 401 and self.auto_refresh:
+                    Clock.schedule_once(lambda _: self.refresh_access_token())
+                    return
+
+                if response.status_code != 200:
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        result = {"msg": f"The request failed with status {response.status_code}."}
+                    Clock.schedule_once(lambda _: self.on_response(result, self.on_failure))
+                    return
+
+                for line in response.iter_lines():
+                    if line:
+                        record = json.loads(line)
+                        Clock.schedule_once(lambda _, record=record: self.on_record(record) if self.on_record is not None else None)
+
+        except requests.exceptions.Timeout:
+            Clock.schedule_once(lambda _: self.on_response({"msg": "Connection timed out."}, self.on_failure))
+            return
+        except (requests.exceptions.RequestException, ValueError):
+            Clock.schedule_once(lambda _: self.on_response({"msg": "The connection to the server failed."}, self.on_failure))
+            return
+
+        Clock.schedule_once(lambda _: self.on_response(None, self.on_success))
+
+
+    # Called when the request failed due to the access token being expired
+    # Gets a new access token with the refresh token then sends the request again
+    def refresh_access_token(self):
+        HEADERS["Authorization"] = f"Bearer {COMMON['REFRESH_TOKEN']}"
+
+        SendRequest(
+            url=f"{API_URL}/refresh",
+            on_success=lambda _, result: self.retry(result),
+            on_failure=lambda _, result: self.on_response(result, self.on_failure),
+            loading_indicator=self.loading_indicator,
+        )
+
+
+    # Called when a new access token was successfully created
+    # Updates the headers and token dictionary accordingly, then sends the request again
+    def retry(self, result):
+        access_token = result.get("access_token")
+        HEADERS["Authorization"] = f"Bearer {access_token}"
+        COMMON["ACCESS_TOKEN"] = access_token
+
+        StreamRequest(
+            url=self.url,
+            body=self.body,
+            on_record=self.on_record,
+            on_success=self.on_success,
+            on_failure=self.on_failure,
+            loading_indicator=self.loading_indicator,
+            auto_refresh=False,
+        )
+
+
+    # Called on the main thread when the response ended or failed
+    # Stops the loading indicator for the HTTP request.
+    def on_response(self, result, callback):
+        self.loading_indicator.stop()
+
+        if callback is not None:
+            callback(result)
@@ -10,6 +10,7 @@ from plyer import gps
 from urllib import parse
 
 from common import API_URL, HEADERS, SendRequest
+from polyline import decode_route
 
 
 # Main class for implementing an interactive map
@@ -216,9 +217,10 @@ class InteractiveMap(MapView):
         )
 
     
-    # Draw routes based on a given list of coordinates
-    def draw_route(self, route: list):
-        # Remember the graphed route for redrawing purposes
+    # Draw routes based on a given list of coordinates or an encoded polyline from the SanDaan API
+    def draw_route(self, route):
+        # Remember the graphed route for redrawing purposes, decoded so that it is only decoded once
+        route = decode_route(route)
         self.graphed_route = route
         
         # Get the pixel coordinates that correspond with the coordinates on the route
@@ -0,0 +1,37 @@
+# Number of decimal places of the encoded polylines requested from the SanDaan API
+POLYLINE_PRECISION = 5
+
+
+# Decode an encoded polyline from the SanDaan API into a list of [lat, lon] points
+# Each coordinate is stored as the difference from the previous one in chunks of 5 bits
+def decode_polyline(polyline: str, precision=POLYLINE_PRECISION):
+    factor = 10 ** precision
+    points = []
+
+    index = 0
+    coords = [0, 0]
+    while index < len(polyline):
+        for axis in range(2):
+            value = 0
+            shift = 0
+            while True:
+                chunk = ord(polyline[index]) - 63
+                index += 1
+                value |= (chunk & 0x1f) << shift
+                shift += 5
+                if chunk < 0x20:
+                    break
+
+            coords[axis] += ~(value >> 1) if value & 1 else value >> 1
+
+        points.append([coords[0] / factor, coords[1] / factor])
+
+    return points
+
+
+# Get the list of [lat, lon] points of a route, which is either already a list or an encoded polyline
+def decode_route(route, precision=POLYLINE_PRECISION):
+    if isinstance(route, str):
+        return decode_polyline(route, precision)
+
+    return route
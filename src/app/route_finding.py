@@ -10,12 +10,16 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.textfield import MDTextField
 import json
 
-from common import API_URL, SendRequest, TopScreenLoadingBar
+from common import API_URL, StreamRequest, TopScreenLoadingBar
 from interactive_map import InteractiveMap
+from polyline import POLYLINE_PRECISION, decode_route
 from route_mapping import ROUTE_MAPPING_TAB
 from search_view import SearchBar
 
 
+# Zoom level that the geometry of directions is simplified for, close enough to still follow every street
+DIRECTIONS_ZOOM = 18
+
 # Kivy string for the mapview screen
 MAPVIEW_SCREEN = '''
 #:import MapView kivy_garden.mapview.MapView
@@ -286,7 +290,16 @@ class RouteFinding(InteractiveMap):
         origin = self.current_location
         destination = self.pinned_location
         
+        # Directions are only drawn on the map, so their geometry is requested as encoded polylines
+        # simplified for the zoom level used when viewing route steps
+        # The walks start and end on the nearest street instead of the nearest intersection
+        # Route combinations are streamed as they are found so that they are shown while the search runs
         body = json.dumps({
+            "stream": True,
+            "snap": "edge",
+            "format": "polyline",
+            "precision": POLYLINE_PRECISION,
+            "simplify": DIRECTIONS_ZOOM,
             "origin": [origin.lat, origin.lon],
             "destination": [destination.lat, destination.lon],
             "route_area": {
@@ -296,36 +309,59 @@ class RouteFinding(InteractiveMap):
             },
         })
 
-        SendRequest(
+        StreamRequest(
             url=url,
             body=body,
-            on_success=lambda _, result: self.show_viable_routes(result), 
-            on_failure=lambda _, result: self.show_route_finding_error(result),
+            on_record=lambda record: self.show_viable_routes(record),
+            on_success=lambda _: self.check_directions_ended(),
+            on_failure=lambda result: self.show_route_finding_error(result),
             loading_indicator=self.loading_bar,
         )
 
 
-    # Called when successfully fetched directions from the SanDaan API
-    def show_viable_routes(self, result):
-        self.directions_button.disabled = False
-        self.waiting_for_directions = False
-
-        # Get the results from the HTTP request     
-        self.viable_routes = result["routes"]
-        self.start_walk = result["start_walk"]
-        self.end_walk = result["end_walk"]
-
-        # Check if there was any routes found, if none, show a dialog message notifying the user
-        if len(self.viable_routes) == 0:
-            self.show_popup_dialog(
-                title="No routes found",
-                content=MDLabel(
-                    text="There are currently no routes in the database that connects you to your destination, consider contributing! :D",
-                ),
-            )
-            return
-        
-        self.show_results()
+    # Called for each record of the directions streamed from the SanDaan API
+    # The walks come first, then each route combination as soon as it is found, which is added to the results
+    # right away, and a summary comes last once the search is done
+    def show_viable_routes(self, record):
+        if record["type"] == "walks":
+            self.viable_routes = []
+            self.viable_walks = []
+            self.start_walk = record["start_walk"]
+            self.end_walk = record["end_walk"]
+
+        elif record["type"] == "route":
+            # Open the results with the first route combination found, then add the others as they come
+            if len(self.viable_routes) == 0:
+                self.route_bottomsheet = MDListBottomSheet()
+                self.route_bottomsheet.open()
+
+            # Each route combination can start and stop riding at different places, so it has its own walks
+            self.add_result(len(self.viable_routes), record["route"])
+            self.viable_routes.append(record["route"])
+            self.viable_walks.append(record["walks"])
+
+        elif record["type"] == "summary":
+            self.directions_button.disabled = False
+            self.waiting_for_directions = False
+
+            # Check if there was any routes found, if none, show a dialog message notifying the user
+            if len(self.viable_routes) == 0:
+                self.viable_routes = None
+                self.show_popup_dialog(
+                    title="No routes found",
+                    content=MDLabel(
+                        text="There are currently no routes in the database that connects you to your destination, consider contributing! :D",
+                    ),
+                )
+
+        elif record["type"] == "error":
+            self.show_route_finding_error(record)
+
+
+    # Called once the streamed directions ended, which shows an error if they ended before their summary
+    def check_directions_ended(self):
+        if self.waiting_for_directions:
+            self.show_route_finding_error({"msg": "The connection ended before all the directions were received."})
 
 
     def show_results(self):
@@ -333,23 +369,31 @@ class RouteFinding(InteractiveMap):
         self.route_bottomsheet = MDListBottomSheet()
 
         # Iterate each route combination from the result
-        for route_steps in self.viable_routes:
-            # Create a string to display the names of the route combination
-            name = " + ".join([route_step["name"] for route_step in route_steps])
-
-            # Add the route combination in list of results
-            self.route_bottomsheet.add_item(
-                text=f"{name}",
-                callback=lambda _, route_steps=route_steps: self.select_route(route_steps),
-            )
+        for index, route_steps in enumerate(self.viable_routes):
+            self.add_result(index, route_steps)
 
         self.route_bottomsheet.open()
 
 
+    # Add a route combination to the list of results
+    def add_result(self, index, route_steps):
+        # Create a string to display the names of the route combination
+        name = " + ".join([route_step["name"] for route_step in route_steps])
+
+        # Add the route combination in list of results
+        self.route_bottomsheet.add_item(
+            text=f"{name}",
+            callback=lambda _, index=index: self.select_route(index),
+        )
+
+
     # Called when the user selects a route combination
-    # Remembers the selected route combination of the user
-    def select_route(self, route_steps):
-        self.selected_route = route_steps
+    # Remembers the selected route combination of the user along with its walks
+    def select_route(self, index):
+        self.selected_route = self.viable_routes[index]
+        if index < len(self.viable_walks):
+            self.start_walk = self.viable_walks[index]["start_walk"]
+            self.end_walk = self.viable_walks[index]["end_walk"]
         self.steps_button.disabled = False
         self.view_route_steps()
         
@@ -361,7 +405,7 @@ class RouteFinding(InteractiveMap):
 
         # Check if the user has to walk a route to get to the main road or first transport route
         # If yes, add the walking route to the route steps
-        if len(self.start_walk) > 1:
+        if len(decode_route(self.start_walk)) > 1:
             self.route_bottomsheet.add_item(
                 text=f"Walk from current location",
                 callback=lambda _, coords=self.start_walk: self.draw_route_step(coords),
@@ -380,7 +424,7 @@ class RouteFinding(InteractiveMap):
 
         # Check if the user has to walk to get to the target location
         # If yes, add to the route steps
-        if len(self.end_walk) > 1:
+        if len(decode_route(self.end_walk)) > 1:
             self.route_bottomsheet.add_item(
                 text=f"Walk to destination",
                 callback=lambda _, coords=self.end_walk: self.draw_route_step(coords),
@@ -401,6 +445,7 @@ class RouteFinding(InteractiveMap):
     def show_route_finding_error(self, result):
         self.directions_button.disabled = False
         self.waiting_for_directions = False
+        self.viable_routes = None
 
         unknown_error_message = "An unknown error occured."
         error_message = result.get("msg", unknown_error_message) if isinstance(result, dict) else unknown_error_message
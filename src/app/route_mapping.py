@@ -195,7 +195,11 @@ class RouteMapping(InteractiveMap):
         self.route_information.bind(height=self.update_dialog_height)
 
         self.route_addresses = []
-        self.prev_graphed_route = None
+
+        # Store the path between each pair of consecutive pins so that only the paths that changed
+        # have to be requested again when a pin is removed
+        self.route_legs = []
+        self.previous_pin_coords = []
     
         # Create a tutorial message for the route mapping manual
         tutorial_message = '''1. Place pins (double tap) to trace the path that the transport route takes
@@ -242,6 +246,7 @@ class RouteMapping(InteractiveMap):
         if self.app.cache.exists("backup"):
             pin_coords = self.app.cache.get("backup").get("pins", [])
             self.graphed_route = self.app.cache.get("backup").get("route", [])
+            self.route_legs = self.app.cache.get("backup").get("legs", [])
 
             for pin_coord in pin_coords:
                 # Places the pin on the map
@@ -279,6 +284,7 @@ class RouteMapping(InteractiveMap):
         # Remember pin to be removed for undoing purposes
         self.removed_pin = pin
         self.removed_pin_index = self.pins.index(pin)
+        self.previous_pin_coords = [(pin.lat, pin.lon) for pin in self.pins]
         self.pins.remove(pin)
 
         # Reconnect all the pins based on the remaining pins
@@ -309,6 +315,7 @@ class RouteMapping(InteractiveMap):
             key="backup",
             pins=[[pin.lat, pin.lon] for pin in self.pins],
             route=self.graphed_route,
+            legs=self.route_legs,
         )
         
         # Places the pin on the map
@@ -367,7 +374,8 @@ class RouteMapping(InteractiveMap):
     # Called when the HTTP request for getting the shortest path between a list of coordinates succeeded
     # Connects the last pin from the previous pin
     def connect_route(self, result):  
-        self.prev_graphed_route = list(self.graphed_route)
+        self.route_legs.append(result["route"])
+
         # Check if the number of pins is exactly two, if yes, draw the route from scratch
         # If no, connect the new route to the existing graphed route
         if len(self.pins) == 2:
@@ -394,22 +402,32 @@ class RouteMapping(InteractiveMap):
         # If yes, remove the graphed route from the screen and disable the "Confirm Route" button
         if len(self.pins) < 2:
             self.remove_route()
+            self.route_legs = []
             self.confirm_route_button.disabled = True
             self.delete_route_button.disabled = True
             return
         
-        if self.removed_pin_index == len(self.pins) and self.prev_graphed_route is not None:
-            self.graphed_route = list(self.prev_graphed_route)
-            self.prev_graphed_route = None
-            self.redraw_route()
+        # Check if the legs of the route are in sync with the pins before removing one
+        # If not, request all the legs of the route again
+        if len(self.route_legs) != len(self.previous_pin_coords) - 1:
+            self.route_legs = []
+            self.previous_pin_coords = []
+
+        # Removing the first or last pin only removes the leg connected to it, so there is nothing to request
+        elif self.removed_pin_index == 0 or self.removed_pin_index == len(self.pins):
+            self.route_legs.pop(0 if self.removed_pin_index == 0 else -1)
+            self.remove_route()
+            self.draw_route(self.join_route_legs())
             return
         
         # Endpoint for finding the shortest path between a list of coordinates through the SanDaan API
         url = f"{API_URL}/route"
         
+        # Send the previous pins as well so that only the legs that changed are computed
         pin_coords = [(pin.lat, pin.lon) for pin in self.pins]
         body = json.dumps({
             "pins": pin_coords,
+            "previous_pins": self.previous_pin_coords,
         })
 
         SendRequest(
@@ -426,11 +444,23 @@ class RouteMapping(InteractiveMap):
         self.waiting_for_route = True
 
 
+    # Combine the legs of the route into a single route
+    def join_route_legs(self):
+        route = []
+        for leg in self.route_legs:
+            route += leg if len(route) == 0 else leg[1:]
+
+        return route
+
+
     # Redraws the new route from the remaining pins
+    # Replaces the legs that changed with the new legs returned by the SanDaan API
     def redraw_all(self, result):
-        self.prev_graphed_route = None
+        splice = result["splice"]
+        self.route_legs[splice["start"]:splice["stop"]] = result["legs"]
+
         self.remove_route()
-        self.draw_route(result["route"])
+        self.draw_route(self.join_route_legs())
 
         # Re-enable the "Confirm Route" button if there is a graphed route
         if len(self.graphed_route) < 2:
@@ -595,7 +625,7 @@ class RouteMapping(InteractiveMap):
 
         self.pins = []
         self.remove_route()
-        self.prev_graphed_route = None
+        self.route_legs = []
 
         # Clear route information
         self.route_information = RouteInformation(self.confirmation_button)
@@ -621,7 +651,7 @@ class RouteMapping(InteractiveMap):
 
         self.pins = []
         self.remove_route()
-        self.prev_graphed_route = None
+        self.route_legs = []
 
         self.confirm_route_button.disabled = True
         self.delete_route_button.disabled = True